@@ -15,6 +15,7 @@
     OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
     SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
+# pylint: disable=too-many-lines
 
 import json
 import argparse
@@ -22,17 +23,65 @@ import argparse
 import subprocess  # nosec B404
 import textwrap
 import os
+import re
 import sys
 import glob
 import csv
+import struct
+import zlib
+import hashlib
+import math
+import heapq
+import bisect
+import html
+import tempfile
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from enum import Enum
-from typing import List
+from functools import lru_cache
+from typing import Callable, List, Optional, NamedTuple
 from shlex import quote
 from tabulate import tabulate
 
 # Preserve white space while printing tabular view
 tabulate.PRESERVE_WHITESPACE = True  # type: ignore
 
+# Binary snapshot file header, magic bytes followed by big endian unsigned short format version.
+SNAPSHOT_MAGIC = b"DCTLSNAP"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct(">8sH")
+# Snapshot section tags, resources sections are tagged with DriftctlResourceType value.
+SNAPSHOT_MANAGED_KEYS_TAG = 5
+SNAPSHOT_CHANGELOG_INDEX_TAG = 6
+SNAPSHOT_GLOBAL_CHANGELOG_TAG = 7
+# Sketch file header of approximate output, magic bytes followed by big endian unsigned short format version.
+SKETCH_MAGIC = b"DCTLSKCH"
+SKETCH_VERSION = 1
+SKETCH_HEADER = struct.Struct(">8sH")
+SKETCH_MIN_PRECISION = 4
+SKETCH_MAX_PRECISION = 18
+# Sparse sketch entries hold register index and rank, rank is at most 65 - SKETCH_MIN_PRECISION.
+SKETCH_RANK_BITS = 6
+SKETCH_RANK_MASK = (1 << SKETCH_RANK_BITS) - 1
+# Standard error of about 0.8% for overall summary, and 3.3% for summary of each account and region.
+DEFAULT_SKETCH_PRECISION = 14
+DEFAULT_SOURCE_SKETCH_PRECISION = 10
+
+# Columns of detail view which can be used for sorting, in the order of detail view columns.
+DETAIL_SORT_COLUMNS = ["category", "id", "type", "region", "account", "source"]
+DEFAULT_SORT_MAX_ROWS_IN_MEMORY = 100000
+DETAIL_HEADERS = ["Category", "Resource Id", "Resource Type", "Region", "Account Id", "Source"]
+
+S3_URL_SCHEME = "s3://"
+# Object holding `terraform output -json` of the scan, stored next to Driftctl scan output json object in S3.
+S3_TERRAFORM_OUTPUT_FILE_NAME = "terraform-output.json"
+# Key path elements recognised as region and account id of Driftctl scan output json object in S3.
+AWS_REGION_PATTERN = re.compile(r"^(us|eu|ap|sa|ca|me|af|il|mx|cn)(-gov|-iso[a-z]?)?-"
+                                r"(north|south|east|west|central|northeast|southeast|northwest|southwest)-\d+$")
+AWS_ACCOUNT_ID_PATTERN = re.compile(r"^\d{12}$")
+DEFAULT_S3_MAX_WORKERS = 16
+
 
 class DriftctlOutputMode(Enum):
     """
@@ -48,6 +97,7 @@ class DriftctlOutputFormat(Enum):
     """
     TABLE = 1
     CSV = 2
+    HTML = 3
 
 
 class DriftctlResourceType(Enum):
@@ -60,6 +110,27 @@ class DriftctlResourceType(Enum):
     DIFF = 4
 
 
+# Driftctl scan output json keys holding resources of each category.
+DRIFTCTL_JSON_CATEGORY_KEYS = ((DriftctlResourceType.UNMANAGED, 'unmanaged'),
+                               (DriftctlResourceType.MISSING, 'missing'),
+                               (DriftctlResourceType.DIFF, 'differences'),
+                               (DriftctlResourceType.MANAGED, 'managed'))
+
+# Category label values used in OpenMetrics output.
+METRICS_CATEGORIES = {
+    DriftctlResourceType.MANAGED: "managed",
+    DriftctlResourceType.UNMANAGED: "unmanaged",
+    DriftctlResourceType.MISSING: "missing",
+    DriftctlResourceType.DIFF: "changed"
+}
+
+
+# Resource type prefixes of global AWS resources (IAM, S3, Route53 and CloudFront), which are reported by driftctl
+# scan of every region, and region reported for these resources.
+GLOBAL_RESOURCE_TYPE_PREFIXES = ("aws_iam_", "aws_s3_", "aws_route53_", "aws_cloudfront_")
+GLOBAL_REGION = "global"
+
+
 class DriftctlResourceMin:
     """
     Drifctl object created after reading driftctl output json
@@ -83,16 +154,124 @@ class DriftctlResourceMin:
                 self.source == other.source or (self.source is None or other.source is None))
 
 
-class DriftctlOutput:
+def get_resource_key(resource_id: str, resource_type: str):
+    """
+    Get fixed width (64 bit) key for resource id and type, key is stable across processes and machines
+    unlike builtin hash for strings, so that keys can be stored in snapshots and merged.
+
+    :param resource_id: resource id
+    :param resource_type: resource type
+    :return: int
+    """
+    digest = hashlib.blake2b(f"{resource_type}\0{resource_id}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class DriftctlChangelogIndex:
+    """
+    Index of attribute paths changed on changed resources, holding number of changes and (account id, resource id)
+    of affected resources for each resource type and attribute path, so that the same resource id drifting in
+    different accounts is counted as different resources. Attribute paths of global resources are also kept for each
+    resource, so that merging snapshots can skip changes of global resources already merged for the account.
+    """
+
+    def __init__(self, max_path_depth=None):
+        """
+        :param max_path_depth: if provided, attribute paths deeper than max_path_depth are truncated and indexed
+        with * as last element, e.g. tags.* for depth 1.
+        """
+        self.max_path_depth = max_path_depth
+        self.paths = {}
+        self.changes = {}
+        self.resources = {}
+        self.global_resource_paths = {}
+
+    def get_path(self, path):
+        """
+        Get interned attribute path tuple, list indexes are replaced with * so that changes to any element of a list
+        are indexed together.
+        :param path: list of attribute path elements from driftctl changelog
+        :return: tuple
+        """
+        parts = tuple("*" if str(part).isdigit() else str(part) for part in path or ())
+        if self.max_path_depth and len(parts) > self.max_path_depth:
+            parts = parts[:self.max_path_depth] + ("*",)
+        return self.paths.setdefault(parts, parts)
+
+    def add_entry(self, resource_type: str, path, resource_keys, changes: int = 1):
+        """
+        Add changes to attribute path for resource type.
+        :param resource_type: resource type
+        :param path: attribute path elements
+        :param resource_keys: iterable of (account id, resource id) of resources affected by the changes
+        :param changes: number of changes
+        :return:
+        """
+        key = (resource_type, self.get_path(path))
+        self.changes[key] = self.changes.get(key, 0) + changes
+        self.resources.setdefault(key, set()).update(resource_keys)
+
+    def add_resource_paths(self, account_id: str, resource_type: str, resource_id: str, paths):
+        """
+        Add a change to each attribute path of a changed resource.
+        :param account_id: account id of changed resource
+        :param resource_type: resource type
+        :param resource_id: resource id
+        :param paths: iterable of attribute path elements, one for each change
+        :return:
+        """
+        resource_key = (account_id or "", resource_id)
+        paths = [self.get_path(path) for path in paths]
+        for path in paths:
+            self.add_entry(resource_type, path, (resource_key,))
+        if paths and is_global_resource_type(resource_type):
+            self.global_resource_paths.setdefault((resource_key[0], resource_type, resource_id), []).extend(paths)
+
+    def add_resource(self, resource: DriftctlResourceMin):
+        """
+        Add changelog entries of changed resource to index.
+        :param resource: DriftctlResourceMin
+        :return:
+        """
+        self.add_resource_paths(resource.account_id, resource.type, resource.id,
+                                [change.get('path') for change in resource.change_log or []])
+
+    def get_rows(self):
+        """
+        Get index rows sorted by number of changes, most changed first.
+        :return: list of list [resource type, attribute path, changes, resources]
+        """
+        rows = [[resource_type, ".".join(path), changes, len(self.resources[(resource_type, path)])]
+                for (resource_type, path), changes in self.changes.items()]
+        rows.sort(key=lambda row: (-row[2], row[0], row[1]))
+        return rows
+
+
+class DriftctlOutput:  # pylint: disable=too-many-instance-attributes
     """
     Driftctl output combining all results retrieved as per command line input
     """
 
-    def __init__(self):
+    def __init__(self, managed_details=False, keep_change_log=True, changelog_depth=None):
+        """
+        :param managed_details: if True, managed resources are cached with details like other resources, else only
+        fixed width keys of managed resources are kept, as managed resources are only counted, each mapped to
+        interned (account id, region, resource type) labels.
+        :param keep_change_log: if False, changelog of changed resources is dropped once indexed in changelog_index.
+        :param changelog_depth: maximum attribute path depth for changelog_index.
+        """
+        self.managed_details = managed_details
+        self.keep_change_log = keep_change_log
+        self.changelog_index = DriftctlChangelogIndex(changelog_depth)
         self.differences = {}
         self.managed = {}
+        self.managed_labels = {}
         self.missing = {}
         self.unmanaged = {}
+        # Set by get_driftctl_combined_output if combining stopped before all resources were read.
+        self.truncated = False
+        # Global resources already read for each account, see _add_global_resource.
+        self.global_resource_index = {}
 
     def __add_resource(self, resource_type: DriftctlResourceType, resource: DriftctlResourceMin):
         """
@@ -144,11 +323,32 @@ class DriftctlOutput:
 
     def add_managed_resource(self, resource: DriftctlResourceMin):
         """
-        Add managed resource to respective object dictionary
+        Add managed resource to respective object dictionary, or only its key if managed details are not cached.
         :param resource: DriftctlResourceMin
         :return:
         """
-        self.__add_resource(DriftctlResourceType.MANAGED, resource)
+        if self.managed_details:
+            self.__add_resource(DriftctlResourceType.MANAGED, resource)
+        else:
+            self.add_managed_resource_key(get_resource_key(resource.id, resource.type), resource.account_id,
+                                          resource.region, resource.type)
+
+    def add_managed_resource_key(self, resource_key: int, account_id: str = "", region: str = "",
+                                 resource_type: str = ""):
+        """
+        Add key of managed resource, as returned by get_resource_key, to managed resources along with its labels.
+        Labels of the first occurrence of a resource are kept, same as details of other resources.
+        :param resource_key: int
+        :param account_id: account id of managed resource
+        :param region: region of managed resource
+        :param resource_type: resource type of managed resource
+        :return:
+        """
+        if self.managed_details:
+            raise ValueError("Managed resource key can not be added when managed resource details are cached")
+        if resource_key not in self.managed:
+            labels = (account_id or "", region or "", resource_type or "")
+            self.managed[resource_key] = self.managed_labels.setdefault(labels, labels)
 
     def add_missing_resource(self, resource: DriftctlResourceMin):
         """
@@ -158,14 +358,47 @@ class DriftctlOutput:
         """
         self.__add_resource(DriftctlResourceType.MISSING, resource)
 
-    def add_changed_resource(self, resource: DriftctlResourceMin):
+    def add_changed_resource(self, resource: DriftctlResourceMin, index_change_log: bool = True):
         """
-        Add changed resource to respective object dictionary
+        Add changed resource to respective object dictionary, and its changelog to changelog index
         :param resource: DriftctlResourceMin
+        :param index_change_log: if False, changelog is not added to changelog index.
         :return:
         """
+        if index_change_log:
+            self.changelog_index.add_resource(resource)
+        if not self.keep_change_log:
+            resource.change_log = None
         self.__add_resource(DriftctlResourceType.DIFF, resource)
 
+    def add_resource(self, resource_type: DriftctlResourceType, resource: DriftctlResourceMin):
+        """
+        Add resource to object dictionary pertaining to resource_type
+        :param resource_type: DriftctlResourceType
+        :param resource: DriftctlResourceMin
+        :return:
+        """
+        if resource_type == DriftctlResourceType.MANAGED:
+            self.add_managed_resource(resource)
+        elif resource_type == DriftctlResourceType.DIFF:
+            self.add_changed_resource(resource)
+        else:
+            self.__add_resource(resource_type, resource)
+
+    def get_resources(self, resource_type: DriftctlResourceType):
+        """
+        Get object dictionary holding resources pertaining to resource_type, for managed resources a dictionary of
+        resource keys to labels is returned if managed details are not cached.
+        :param resource_type: DriftctlResourceType
+        :return: dict
+        """
+        return {
+            DriftctlResourceType.MANAGED: self.managed,
+            DriftctlResourceType.UNMANAGED: self.unmanaged,
+            DriftctlResourceType.MISSING: self.missing,
+            DriftctlResourceType.DIFF: self.differences
+        }[resource_type]
+
     def get_summary(self):
         """
         Get summary for Driftctl scan resource cached on this object.
@@ -223,6 +456,323 @@ class DriftctlSummary:
             self.total_missing == other.total_missing and self.total_unmanaged == other.total_unmanaged
 
 
+class DriftctlExitCode(Enum):
+    """
+    ENUM for exit codes of CI gate mode
+    """
+    OK = 0
+    COVERAGE_BELOW_THRESHOLD = 3
+    UNMANAGED_ABOVE_THRESHOLD = 4
+    MISSING_ABOVE_THRESHOLD = 5
+    CHANGED_ABOVE_THRESHOLD = 6
+
+
+class DriftctlGate:
+    """
+    Thresholds for CI gate mode, None for any of the thresholds disables the respective check.
+    """
+
+    def __init__(self, **kwargs):
+        self.fail_under_coverage = kwargs.get('fail_under_coverage')
+        self.max_unmanaged = kwargs.get('max_unmanaged')
+        self.max_missing = kwargs.get('max_missing')
+        self.max_changed = kwargs.get('max_changed')
+
+    def is_enabled(self):
+        """
+        Check if any of the thresholds is set
+        :return: bool
+        """
+        return any(threshold is not None for threshold in (self.fail_under_coverage, self.max_unmanaged,
+                                                           self.max_missing, self.max_changed))
+
+    def get_count_breaches(self, output: DriftctlOutput):
+        """
+        Get breached count thresholds, once breached these remain breached as more resources are combined.
+        :param output: Driftctl output object, or DriftctlApproximateOutput.
+        :return: List of (DriftctlExitCode, message)
+        """
+        breaches = []
+        summary = output.get_summary()
+        for threshold, count, category, exit_code in (
+                (self.max_unmanaged, summary.total_unmanaged, "unmanaged", DriftctlExitCode.UNMANAGED_ABOVE_THRESHOLD),
+                (self.max_missing, summary.total_missing, "missing", DriftctlExitCode.MISSING_ABOVE_THRESHOLD),
+                (self.max_changed, summary.total_changed, "changed", DriftctlExitCode.CHANGED_ABOVE_THRESHOLD)):
+            if threshold is not None and count > threshold:
+                breaches.append((exit_code, f"{category} resource(s) count exceeds maximum of {threshold}"))
+        return breaches
+
+    def is_decided(self, output: DriftctlOutput):
+        """
+        Check if outcome is already decided, i.e. any of the count thresholds is breached.
+        :param output: Driftctl output object.
+        :return: bool
+        """
+        return (self.max_unmanaged is not None and len(output.unmanaged) > self.max_unmanaged) or \
+            (self.max_missing is not None and len(output.missing) > self.max_missing) or \
+            (self.max_changed is not None and len(output.differences) > self.max_changed)
+
+    def check(self, output: DriftctlOutput):
+        """
+        Check all thresholds for combined output.
+        :param output: Driftctl output object, or DriftctlApproximateOutput.
+        :return: List of (DriftctlExitCode, message), empty if all checks passed.
+        """
+        breaches = self.get_count_breaches(output)
+        coverage = output.get_summary().coverage
+        if self.fail_under_coverage is not None and coverage < self.fail_under_coverage:
+            breaches.append((DriftctlExitCode.COVERAGE_BELOW_THRESHOLD,
+                             f"coverage {coverage}% is below minimum of {self.fail_under_coverage}%"))
+        return breaches
+
+
+class DriftctlSketch:
+    """
+    HyperLogLog sketch estimating number of distinct resource keys (see get_resource_key) in fixed memory of
+    2 ** precision bytes, with standard error of about 1.04 / sqrt(2 ** precision), i.e. 0.8% for precision 14.
+    Sketch starts sparse, holding only registers set so far as sorted (index, rank) entries, and switches to
+    2 ** precision byte registers once sparse entries would use as much memory, so sketches of small sources stay small.
+    Sketches of the same precision are merged by taking maximum of each register, so merging sketches built from
+    different files, processes or machines gives the same estimate as a single sketch built from all resources.
+    """
+
+    def __init__(self, precision: int = DEFAULT_SKETCH_PRECISION, registers: Optional[bytes] = None):
+        if not SKETCH_MIN_PRECISION <= precision <= SKETCH_MAX_PRECISION:
+            raise ValueError(f"Sketch precision should be between {SKETCH_MIN_PRECISION} and {SKETCH_MAX_PRECISION}")
+        self.precision = precision
+        # Sparse entries are index << SKETCH_RANK_BITS | rank, sorted by index, until registers are allocated.
+        self.entries = array("I")
+        self.registers: Optional[bytearray] = None
+        if registers is not None:
+            if len(registers) != 1 << precision:
+                raise ValueError(f"Sketch of precision {precision} should have {1 << precision} registers")
+            self.registers = bytearray(registers)
+
+    def is_sparse(self):
+        """
+        Check if sketch still holds sparse entries instead of registers.
+        :return: bool
+        """
+        return self.registers is None
+
+    def add_key(self, key: int):
+        """
+        Add 64 bit resource key to sketch, first precision bits of key select the register, which holds maximum
+        position of first set bit in remaining bits seen so far.
+        :param key: resource key, as returned by get_resource_key
+        """
+        remaining_bits = 64 - self.precision
+        self.update_register(key >> remaining_bits,
+                             remaining_bits - (key & ((1 << remaining_bits) - 1)).bit_length() + 1)
+
+    def update_register(self, index: int, rank: int):
+        """
+        Set register of sketch to rank, if rank is greater than value of register.
+        :param index: register index, less than 2 ** precision
+        :param rank: position of first set bit, at most 65 - precision
+        """
+        if self.registers is not None:
+            if rank > self.registers[index]:
+                self.registers[index] = rank
+            return
+        entry = index << SKETCH_RANK_BITS
+        position = bisect.bisect_left(self.entries, entry)
+        if position < len(self.entries) and self.entries[position] >> SKETCH_RANK_BITS == index:
+            if rank > self.entries[position] & SKETCH_RANK_MASK:
+                self.entries[position] = entry | rank
+            return
+        self.entries.insert(position, entry | rank)
+        if len(self.entries) * self.entries.itemsize >= 1 << self.precision:
+            self.registers = self.get_registers()
+            self.entries = array("I")
+
+    def get_registers(self):
+        """
+        Get registers of sketch, built from sparse entries if registers are not allocated yet.
+        :return: bytearray of 2 ** precision registers
+        """
+        if self.registers is not None:
+            return self.registers
+        registers = bytearray(1 << self.precision)
+        for entry in self.entries:
+            registers[entry >> SKETCH_RANK_BITS] = entry & SKETCH_RANK_MASK
+        return registers
+
+    def merge(self, other: "DriftctlSketch"):
+        """
+        Merge other sketch into this sketch.
+        :param other: DriftctlSketch of the same precision
+        """
+        if other.precision != self.precision:
+            raise ValueError(f"Can not merge sketch of precision {other.precision} into sketch of precision "
+                             f"{self.precision}")
+        if other.registers is None:
+            for entry in other.entries:
+                self.update_register(entry >> SKETCH_RANK_BITS, entry & SKETCH_RANK_MASK)
+            return
+        self.registers = bytearray(map(max, self.get_registers(), other.registers))
+        self.entries = array("I")
+
+    def _get_register_counts(self):
+        """
+        Count registers by value, instead of iterating over each register for estimate.
+        :return: list of number of registers with each value from 0 to 65 - precision
+        """
+        if self.registers is not None:
+            return [self.registers.count(rank) for rank in range(66 - self.precision)]
+        counts = [0] * (66 - self.precision)
+        for entry in self.entries:
+            counts[entry & SKETCH_RANK_MASK] += 1
+        counts[0] = (1 << self.precision) - len(self.entries)
+        return counts
+
+    @staticmethod
+    def _sigma(value: float):
+        """
+        Correction for registers still zero, see estimate.
+        :param value: fraction of zero registers, less than 1
+        :return: float
+        """
+        result = value
+        power = 1.0
+        while True:
+            value *= value
+            previous = result
+            result += value * power
+            power += power
+            if result == previous:
+                return result
+
+    @staticmethod
+    def _tau(value: float):
+        """
+        Correction for registers at maximum rank, see estimate.
+        :param value: fraction of registers not at maximum rank
+        :return: float
+        """
+        if value in (0.0, 1.0):
+            return 0.0
+        result = 1 - value
+        power = 1.0
+        while True:
+            value = math.sqrt(value)
+            previous = result
+            power *= 0.5
+            result -= (1 - value) ** 2 * power
+            if result == previous:
+                return result / 3
+
+    def estimate(self):
+        """
+        Estimate number of distinct keys added to sketch with improved estimator of Ertl (New cardinality estimation
+        algorithms for HyperLogLog sketches, 2017), which corrects for zero and maximum rank registers instead of
+        switching to linear counting, so estimate has no bias for small cardinalities nor around the switch.
+        :return: float
+        """
+        registers = 1 << self.precision
+        max_rank = 65 - self.precision
+        counts = self._get_register_counts()
+        if counts[0] == registers:
+            return 0.0
+        harmonic_sum = registers * self._tau(1 - counts[max_rank] / registers)
+        for rank in range(max_rank - 1, 0, -1):
+            harmonic_sum = 0.5 * (harmonic_sum + counts[rank])
+        harmonic_sum += registers * self._sigma(counts[0] / registers)
+        return registers * registers / (2 * math.log(2) * harmonic_sum)
+
+    def get_count(self):
+        """
+        Get estimated number of distinct keys added to sketch, rounded to integer.
+        :return: int
+        """
+        return int(round(self.estimate()))
+
+    def __eq__(self, other):
+        if not isinstance(other, DriftctlSketch):
+            return False
+        return self.precision == other.precision and self.get_registers() == other.get_registers()
+
+
+class DriftctlApproximateOutput:
+    """
+    Approximate counterpart of DriftctlOutput holding a DriftctlSketch for each category of resources, and for each
+    category of each account and region, instead of resources. Memory used for overall summary is fixed irrespective
+    of number of resources, and memory used for account and region summaries grows only with number of accounts and
+    regions.
+    """
+
+    def __init__(self, precision: int = DEFAULT_SKETCH_PRECISION,
+                 source_precision: int = DEFAULT_SOURCE_SKETCH_PRECISION):
+        self.precision = precision
+        self.source_precision = source_precision
+        self.sketches = {resource_type: DriftctlSketch(precision) for resource_type in DriftctlResourceType}
+        self.source_sketches: dict = {}
+
+    def get_source_sketches(self, account_id: str, region: str):
+        """
+        Get sketches for each category of account id and region, sketches are created if not found.
+        :param account_id: account id
+        :param region: region
+        :return: dict of DriftctlResourceType to DriftctlSketch
+        """
+        sketches = self.source_sketches.get((account_id, region))
+        if sketches is None:
+            sketches = {resource_type: DriftctlSketch(self.source_precision) for resource_type in DriftctlResourceType}
+            self.source_sketches[(account_id, region)] = sketches
+        return sketches
+
+    def add_resource_key(self, resource_type: DriftctlResourceType, key: int, account_id: str = "", region: str = ""):
+        """
+        Add resource key to sketches of category, and of category of account id and region.
+        :param resource_type: DriftctlResourceType
+        :param key: resource key, as returned by get_resource_key
+        :param account_id: account id
+        :param region: region
+        """
+        self.sketches[resource_type].add_key(key)
+        self.get_source_sketches(account_id, region)[resource_type].add_key(key)
+
+    def merge(self, other: "DriftctlApproximateOutput"):
+        """
+        Merge sketches of other approximate output into this output.
+        :param other: DriftctlApproximateOutput with same precisions.
+        """
+        for resource_type, sketch in other.sketches.items():
+            self.sketches[resource_type].merge(sketch)
+        for (account_id, region), sketches in other.source_sketches.items():
+            source_sketches = self.get_source_sketches(account_id, region)
+            for resource_type, sketch in sketches.items():
+                source_sketches[resource_type].merge(sketch)
+
+    @staticmethod
+    def _get_summary(sketches: dict):
+        """
+        Get approximate summary from sketches of each category.
+        :param sketches: dict of DriftctlResourceType to DriftctlSketch
+        :return: DriftctlSummary
+        """
+        return DriftctlSummary(
+            total_managed=sketches[DriftctlResourceType.MANAGED].get_count(),
+            total_missing=sketches[DriftctlResourceType.MISSING].get_count(),
+            total_unmanaged=sketches[DriftctlResourceType.UNMANAGED].get_count(),
+            total_changed=sketches[DriftctlResourceType.DIFF].get_count()
+        )
+
+    def get_summary(self):
+        """
+        Get approximate summary for all resources added to this object.
+        :return: DriftctlSummary
+        """
+        return self._get_summary(self.sketches)
+
+    def get_source_summaries(self):
+        """
+        Get approximate summary for each account id and region.
+        :return: dict of (account id, region) to DriftctlSummary
+        """
+        return {source: self._get_summary(sketches) for source, sketches in self.source_sketches.items()}
+
+
 def get_driftctl_resource(resource: dict, region: str = "", account_id: str = "", source_file_name: str = "",
                           wrap_text: bool = False):
     """
@@ -244,45 +794,263 @@ def get_driftctl_resource(resource: dict, region: str = "", account_id: str = ""
                                region=region, account_id=account_id)
 
 
-def get_driftctl_combined_output(driftctl_output_json_dicts=None, wrap_text: bool = False):
+class DriftctlResourceRecord(NamedTuple):
+    """
+    Resource read from Driftctl scan output json, along with its category.
     """
+    resource_type: DriftctlResourceType
+    resource: DriftctlResourceMin
 
-    Analyse and merge, all Driftctl scan output json files dict(s) and produce a combined output.
 
-    :param driftctl_output_json_dicts: List of Drifctl scan output json dict.
+class DriftctlResourceFilter:
+    """
+    Filter for resources read from Driftctl scan output json, None for any of the criteria matches all resources.
+    """
+
+    def __init__(self, categories=None, types=None, regions=None, account_ids=None):
+        """
+        :param categories: iterable of DriftctlResourceType to include.
+        :param types: iterable of resource types (e.g. aws_iam_policy) to include.
+        :param regions: iterable of regions to include, matched against region reported for resources, i.e. global
+        resources (see GLOBAL_RESOURCE_TYPE_PREFIXES) only match GLOBAL_REGION.
+        :param account_ids: iterable of account ids to include.
+        """
+        self.categories = None if categories is None else frozenset(categories)
+        self.types = None if types is None else frozenset(types)
+        self.regions = None if regions is None else frozenset(regions)
+        self.account_ids = None if account_ids is None else frozenset(account_ids)
+
+    def matches_source(self, region: str, account_id: str):
+        """
+        Check if resources from Driftctl scan output json for region and account id can match the filter, global
+        resources of scan output of any region can match GLOBAL_REGION.
+        :param region: region of Driftctl scan output json
+        :param account_id: account id of Driftctl scan output json
+        :return: bool
+        """
+        return (self.regions is None or region in self.regions or GLOBAL_REGION in self.regions) and \
+            (self.account_ids is None or account_id in self.account_ids)
+
+    def matches_region(self, region: str):
+        """
+        Check if resources reported with region can match the filter.
+        :param region: region reported for resource, GLOBAL_REGION for global resources.
+        :return: bool
+        """
+        return self.regions is None or region in self.regions
+
+    def matches_category(self, resource_type: DriftctlResourceType):
+        """
+        Check if resources of category can match the filter.
+        :param resource_type: DriftctlResourceType
+        :return: bool
+        """
+        return self.categories is None or resource_type in self.categories
+
+    def matches_type(self, _type: str):
+        """
+        Check if resources of resource type can match the filter.
+        :param _type: resource type
+        :return: bool
+        """
+        return self.types is None or _type in self.types
+
+
+@lru_cache(maxsize=None)
+def is_global_resource_type(_type: str):
+    """
+    Check if resource type is a global resource type, which is reported by driftctl scan of every region.
+    :param _type: resource type
+    :return: bool
+    """
+    return _type.startswith(GLOBAL_RESOURCE_TYPE_PREFIXES)
+
+
+def get_reported_region(_type: str, region: str):
+    """
+    Get region reported for resource of resource type found in Driftctl scan output json of region.
+    :param _type: resource type
+    :param region: region of Driftctl scan output json
+    :return: GLOBAL_REGION for global resource types, else region
+    """
+    return GLOBAL_REGION if is_global_resource_type(_type) else region
+
+
+def _add_global_resource(global_resource_index: dict, account_id: str, resource_type: DriftctlResourceType,
+                         _type: str, _id: str):
+    """
+    Add global resource to index of global resources already read for account. Resources of unknown account are not
+    indexed, as scan outputs of unknown account may be of different accounts.
+    :param global_resource_index: dict of account id to set of global resources already read for the account.
+    :param account_id: account id of Driftctl scan output json the resource is read from.
+    :param resource_type: DriftctlResourceType
+    :param _type: resource type
+    :param _id: resource id
+    :return: True if resource was not already in index of account or account is unknown, else False
+    """
+    if not account_id:
+        return True
+    account_global_resources = global_resource_index.setdefault(account_id, set())
+    key = (resource_type, _type, _id)
+    if key in account_global_resources:
+        return False
+    account_global_resources.add(key)
+    return True
+
+
+def iter_driftctl_resources(driftctl_output_json_dicts=None, wrap_text: bool = False,
+                            filters: Optional[DriftctlResourceFilter] = None,
+                            global_resource_index: Optional[dict] = None):
+    """
+
+    Generate resources from Driftctl scan output json dict(s), as and when each resource is read. Resources are not
+    merged, so the same resource can be generated more than once if it is found in multiple Driftctl scan outputs.
+    Region of global resources (see GLOBAL_RESOURCE_TYPE_PREFIXES) is reported as GLOBAL_REGION.
+
+    :param driftctl_output_json_dicts: iterable of Drifctl scan output json dict.
     :param wrap_text: if True, details for resource under driftctl_output_json_dicts are wrapped to be displayed.
-    :return: DriftctlOutput
+    :param filters: DriftctlResourceFilter, resources not matching filter are skipped before being created.
+    :param global_resource_index: dict of account id to set of global resources already read for the account, if
+    provided, global resources already in the index for the same account are skipped before being created, and
+    others are added to the index.
+    :return: generator of DriftctlResourceRecord
     """
     if driftctl_output_json_dicts is None:
         driftctl_output_json_dicts = []
-    driftctl_output = DriftctlOutput()
+    if filters is None:
+        filters = DriftctlResourceFilter()
     for drift_output in driftctl_output_json_dicts:
         source_file_name = drift_output.get('source_file_name')
         region = drift_output.get('resource_region')
         account_id = drift_output.get('resource_account_id')
+        if not filters.matches_source(region, account_id):
+            continue
+
+        for resource_type, key in DRIFTCTL_JSON_CATEGORY_KEYS:
+            if drift_output.get(key) is None or not filters.matches_category(resource_type):
+                continue
+            for resource in drift_output.get(key):
+                change_log = None
+                if resource_type == DriftctlResourceType.DIFF:
+                    change_log = resource.get('changelog')
+                    resource = resource.get('res')
+                _type = resource.get('type', "")
+                resource_region = get_reported_region(_type, region)
+                if not filters.matches_type(_type) or not filters.matches_region(resource_region):
+                    continue
+                if is_global_resource_type(_type) and global_resource_index is not None and not _add_global_resource(
+                        global_resource_index, account_id, resource_type, _type, resource.get('id', "")):
+                    continue
+                record = DriftctlResourceRecord(resource_type, get_driftctl_resource(
+                    resource, resource_region, account_id, source_file_name, wrap_text))
+                if change_log is not None:
+                    record.resource.change_log = change_log
+                yield record
+
+
+def get_driftctl_combined_output(driftctl_output_json_dicts=None, wrap_text: bool = False,  # pylint: disable=R0913,R0917
+                                 managed_details: bool = False, keep_change_log: bool = True,
+                                 changelog_depth: Optional[int] = None,
+                                 stop_condition: Optional[Callable[[DriftctlOutput], bool]] = None,
+                                 filters: Optional[DriftctlResourceFilter] = None):
+    """
 
-        if drift_output.get('unmanaged') is not None:
-            for unmanaged_resource in drift_output.get('unmanaged'):
-                driftctl_output.add_unmanaged_resource(
-                    get_driftctl_resource(unmanaged_resource, region, account_id, source_file_name, wrap_text))
-        if drift_output.get('missing') is not None:
-            for missing_resource in drift_output.get('missing'):
-                driftctl_output.add_missing_resource(
-                    get_driftctl_resource(missing_resource, region, account_id, source_file_name, wrap_text))
-
-        if drift_output.get('differences') is not None:
-            for difference in drift_output.get('differences'):
-                res = difference.get('res')
-                res["change_log"] = difference.get('changelog')
-                driftctl_output.add_changed_resource(get_driftctl_resource(res, region, account_id,
-                                                                           source_file_name, wrap_text))
-        if drift_output.get('managed') is not None:
+    Analyse and merge, all Driftctl scan output json files dict(s) and produce a combined output. Global resources
+    reported by driftctl scan of every region of an account are only combined from the first scan output read for
+    the account.
+
+    :param driftctl_output_json_dicts: List of Drifctl scan output json dict.
+    :param wrap_text: if True, details for resource under driftctl_output_json_dicts are wrapped to be displayed.
+    :param managed_details: if True, details of managed resources are cached, else managed resources are only counted.
+    :param keep_change_log: if False, changelog of changed resources is only kept in changelog index of the output.
+    :param changelog_depth: maximum attribute path depth for changelog index of the output.
+    :param stop_condition: if provided, called after each unmanaged, missing or changed resource is combined, and
+    remaining resources and Driftctl scan output json dict(s) are not read once it returns True. truncated attribute
+    of the output is set if any resource or Driftctl scan output json dict was left unread.
+    :param filters: DriftctlResourceFilter, only resources matching filter are combined.
+    :return: DriftctlOutput
+    """
+    if driftctl_output_json_dicts is None:
+        driftctl_output_json_dicts = []
+    if filters is None:
+        filters = DriftctlResourceFilter()
+    driftctl_output = DriftctlOutput(managed_details=managed_details, keep_change_log=keep_change_log,
+                                     changelog_depth=changelog_depth)
+    # Managed resources are only counted unless details are requested, so resource objects are not created for them.
+    record_filters = filters if managed_details else DriftctlResourceFilter(
+        categories=[category for category in (DriftctlResourceType.UNMANAGED, DriftctlResourceType.MISSING,
+                                              DriftctlResourceType.DIFF) if filters.matches_category(category)],
+        types=filters.types, regions=filters.regions, account_ids=filters.account_ids)
+    count_managed = not managed_details and filters.matches_category(DriftctlResourceType.MANAGED)
+    drift_outputs = iter(driftctl_output_json_dicts)
+    for drift_output in drift_outputs:
+        records = iter_driftctl_resources([drift_output], wrap_text, record_filters,
+                                          driftctl_output.global_resource_index)
+        stopped = False
+        for record in records:
+            driftctl_output.add_resource(record.resource_type, record.resource)
+            if stop_condition is not None and stop_condition(driftctl_output):
+                stopped = True
+                break
+        if stopped and next(records, None) is not None:
+            driftctl_output.truncated = True
+            return driftctl_output
+        if count_managed and drift_output.get('managed') is not None and filters.matches_source(
+                drift_output.get('resource_region'), drift_output.get('resource_account_id')):
             for managed_resource in drift_output.get('managed'):
-                driftctl_output.add_managed_resource(
-                    get_driftctl_resource(managed_resource, region, account_id, source_file_name, wrap_text))
+                _type = managed_resource.get('type', "")
+                resource_region = get_reported_region(_type, drift_output.get('resource_region'))
+                if not filters.matches_type(_type) or not filters.matches_region(resource_region):
+                    continue
+                driftctl_output.add_managed_resource_key(
+                    get_resource_key(managed_resource.get('id', ""), _type), drift_output.get('resource_account_id'),
+                    resource_region, _type)
+        if stopped:
+            driftctl_output.truncated = next(drift_outputs, None) is not None
+            return driftctl_output
     return driftctl_output
 
 
+def get_driftctl_approximate_output(driftctl_output_json_dicts=None, filters: Optional[DriftctlResourceFilter] = None,
+                                    precision: int = DEFAULT_SKETCH_PRECISION,
+                                    source_precision: int = DEFAULT_SOURCE_SKETCH_PRECISION):
+    """
+
+    Add keys of all resources in Driftctl scan output json dict(s) to sketches of a DriftctlApproximateOutput.
+    Resource objects are not created, and resources found in multiple scan outputs, like global resources, are
+    counted once by the sketches.
+
+    :param driftctl_output_json_dicts: iterable of Drifctl scan output json dict.
+    :param filters: DriftctlResourceFilter, resources not matching filter are skipped.
+    :param precision: precision of sketches of each category.
+    :param source_precision: precision of sketches of each category of each account and region.
+    :return: DriftctlApproximateOutput
+    """
+    if driftctl_output_json_dicts is None:
+        driftctl_output_json_dicts = []
+    if filters is None:
+        filters = DriftctlResourceFilter()
+    output = DriftctlApproximateOutput(precision=precision, source_precision=source_precision)
+    for drift_output in driftctl_output_json_dicts:
+        region = drift_output.get('resource_region') or ""
+        account_id = drift_output.get('resource_account_id') or ""
+        if not filters.matches_source(region, account_id):
+            continue
+        for resource_type, key in DRIFTCTL_JSON_CATEGORY_KEYS:
+            if drift_output.get(key) is None or not filters.matches_category(resource_type):
+                continue
+            for resource in drift_output.get(key):
+                if resource_type == DriftctlResourceType.DIFF:
+                    resource = resource.get('res')
+                _type = resource.get('type', "")
+                resource_region = get_reported_region(_type, region)
+                if not filters.matches_type(_type) or not filters.matches_region(resource_region):
+                    continue
+                output.add_resource_key(resource_type, get_resource_key(resource.get('id', ""), _type), account_id,
+                                        resource_region)
+    return output
+
+
 def print_data_table(writer, data=None, headers=None):
     """
     Print table on screen with tabulate, with fancy_grid format, for provided data and headers.
@@ -315,89 +1083,1058 @@ def print_data_csv(writer, data=None, headers=None):
     csv_writer.writerows(data)
 
 
-def print_driftctl_op(output: DriftctlOutput, print_details: bool = False,
-                      output_file_mode: DriftctlOutputMode = DriftctlOutputMode.STDOUT,
-                      output_file_name: str = "",
-                      output_file_format: DriftctlOutputFormat = DriftctlOutputFormat.TABLE):
+def get_detail_rows(output: DriftctlOutput):
+    """
+    Generate detail view rows for missing, unmanaged and changed resources cached on output.
+    :param output: Driftctl output object.
+    :return: generator of list [category, id, type, region, account id, source]
+    """
+    for category, resources in (("Missing", output.missing), ("Unmanaged", output.unmanaged),
+                                ("Changed", output.differences)):
+        for resource in resources.values():
+            yield [category, resource.id, resource.type, resource.region, resource.account_id, resource.source]
+
+
+def _spill_sorted_run(rows):
+    """
+    Write sorted rows to temporary file, one json list per line.
+    :param rows: sorted list of rows
+    :return: temporary file object, positioned at start of file.
+    """
+    # pylint: disable=consider-using-with
+    run_file = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+    for row in rows:
+        run_file.write(json.dumps(row, separators=(",", ":")))
+        run_file.write("\n")
+    run_file.seek(0)
+    return run_file
+
+
+def _read_sorted_run(run_file):
+    """
+    Read rows written by _spill_sorted_run.
+    :param run_file: temporary file object
+    :return: generator of rows
     """
-    Print details of output in tabular or csv format on provided file mode.
+    for line in run_file:
+        yield json.loads(line)
 
+
+def sort_detail_rows(rows, sort_by: List[str], max_rows_in_memory: int = DEFAULT_SORT_MAX_ROWS_IN_MEMORY):
+    """
+
+    Sort detail view rows by columns provided. At most max_rows_in_memory rows are sorted in memory at once, if there
+    are more rows, sorted runs are spilled to temporary files and k-way merged. Sort is stable, rows with equal sort
+    columns are yielded in the order they were provided.
+
+    :param rows: iterable of detail rows as generated by get_detail_rows.
+    :param sort_by: List of column names from DETAIL_SORT_COLUMNS.
+    :param max_rows_in_memory: maximum number of rows held in memory for sorting.
+    :return: generator of sorted rows
+    """
+    indexes = [DETAIL_SORT_COLUMNS.index(column) for column in sort_by]
+
+    def sort_key(row):
+        return tuple(row[index] or "" for index in indexes)
+
+    max_rows_in_memory = max(max_rows_in_memory, 1)
+    runs = []
+    chunk = []
+    try:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= max_rows_in_memory:
+                chunk.sort(key=sort_key)
+                runs.append(_spill_sorted_run(chunk))
+                chunk = []
+        chunk.sort(key=sort_key)
+        if not runs:
+            yield from chunk
+            return
+        yield from heapq.merge(*[_read_sorted_run(run_file) for run_file in runs], chunk, key=sort_key)
+    finally:
+        for run_file in runs:
+            run_file.close()
+
+
+def print_separator(writer):
+    """
+    Print separator between summary, detail view and changelog index.
+    :param writer: IO Handler for writing output.
+    """
+    print(
+        "\n--------------------------------------------------------------------------------------------------------"
+        "-------------------------------------------------------------------\n", file=writer)
+
+
+def print_detail_view(writer, output: DriftctlOutput,
+                      output_file_format: DriftctlOutputFormat = DriftctlOutputFormat.TABLE,
+                      sort_by: Optional[List[str]] = None,
+                      sort_max_rows_in_memory: int = DEFAULT_SORT_MAX_ROWS_IN_MEMORY):
+    """
+    Print missing, unmanaged and changed resources in tabular, csv or html format.
+    :param writer: IO Handler for writing output.
     :param output: Driftctl output object.
-    :param print_details: If True, print details TABLE or CSV after printing Summary details.
-    :param output_file_mode: DriftctlOutputMode, defaults to STDOUT
-    :param output_file_name: if output_file_mode is not STDOUT, then output will be written to the file name provided.
-    if output_file_mode is CSV, then output_file_name should end with csv, else .csv will be appended to the
-    provided output file name.
     :param output_file_format: DriftctlOutputFormat, defaults to TABLE.
+    :param sort_by: List of detail columns (DETAIL_SORT_COLUMNS) to sort detail view by.
+    :param sort_max_rows_in_memory: maximum number of detail rows sorted in memory.
+    """
+    detail_rows = get_detail_rows(output)
+    if sort_by:
+        detail_rows = sort_detail_rows(detail_rows, sort_by, sort_max_rows_in_memory)
+
+    if output_file_format == DriftctlOutputFormat.HTML:
+        print_html_detail_view(writer, detail_rows, DETAIL_HEADERS)
+    elif output_file_format == DriftctlOutputFormat.TABLE:
+        detail_table = []
+        for category, _id, _type, region, account_id, _source in detail_rows:
+            _id = "\n".join(textwrap.wrap(_id))
+            _source = "\n".join(textwrap.wrap(_source, width=40))
+            detail_table.append([category, _id, _type, region, account_id, _source])
+        print_data_table(writer=writer, data=detail_table, headers=DETAIL_HEADERS)
+    elif output_file_format == DriftctlOutputFormat.CSV:
+        print_data_csv(writer=writer, data=detail_rows, headers=DETAIL_HEADERS)
+
 
+def print_changelog_index(writer, changelog_index: DriftctlChangelogIndex,
+                          output_file_format: DriftctlOutputFormat = DriftctlOutputFormat.TABLE):
     """
-    # Generate table for summary
-    summary_table = []
-    summary_headers = ["Summary", "count"]
-    summary = output.get_summary()
-    summary_table.append(["Coverage", f"{summary.coverage}%"])
-    summary_table.append(["Found resource(s)", summary.total_resources])
-    summary_table.append(["Resource(s) managed by Terraform", summary.total_managed])
-    summary_table.append(["Resource(s) found in a Terraform state but missing on the cloud provider",
-                          summary.total_missing])
-    summary_table.append(["Resource(s) not managed by Terraform", summary.total_unmanaged])
-    summary_table.append(["Resource(s) out of sync with Terraform state", summary.total_changed])
+    Print changelog index of changed attribute paths, most changed first, in tabular, csv or html format.
+    :param writer: IO Handler for writing output.
+    :param changelog_index: DriftctlChangelogIndex
+    :param output_file_format: DriftctlOutputFormat, defaults to TABLE.
+    """
+    changelog_headers = ["Resource Type", "Attribute Path", "Changes", "Resource(s)"]
+    if output_file_format == DriftctlOutputFormat.HTML:
+        writer.write("<h2>Changelog summary</h2>\n" + _get_html_table(changelog_headers, changelog_index.get_rows()))
+    elif output_file_format == DriftctlOutputFormat.TABLE:
+        print_data_table(writer=writer, data=changelog_index.get_rows(), headers=changelog_headers)
+    elif output_file_format == DriftctlOutputFormat.CSV:
+        print_data_csv(writer=writer, data=changelog_index.get_rows(), headers=changelog_headers)
+
+
+# Self-contained html report, detail view rows are embedded as a json payload of string table references and rendered
+# by the script below, only rows in the visible part of the detail view are added to the page.
+HTML_REPORT_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>Driftctl result</title>
+<style>
+body { font-family: sans-serif; font-size: 14px; margin: 1em; }
+table { border-collapse: collapse; margin-bottom: 1em; }
+th, td { border: 1px solid #ccc; padding: 2px 8px; text-align: left; }
+.grid { display: grid; grid-template-columns: 7em 2fr 1.2fr 8em 9em 2fr; }
+.grid > div { height: 24px; line-height: 24px; padding: 0 4px; overflow: hidden; white-space: nowrap;
+  text-overflow: ellipsis; border-bottom: 1px solid #eee; }
+#driftctl-header > div { font-weight: bold; cursor: pointer; user-select: none; border-bottom: 1px solid #999; }
+#driftctl-viewport { height: 70vh; overflow-y: auto; position: relative; border: 1px solid #ccc; }
+#driftctl-rows { position: absolute; left: 0; right: 0; top: 0; }
+</style>
+</head>
+<body>
+<h1>Driftctl result</h1>
+"""
+HTML_REPORT_DETAIL_VIEW = """<h2>Details</h2>
+<p><input id="driftctl-filter" type="search" placeholder="Filter" size="40"> <span id="driftctl-status"></span></p>
+<div id="driftctl-header" class="grid"></div>
+<div id="driftctl-viewport"><div id="driftctl-spacer"></div><div id="driftctl-rows"></div></div>
+"""
+HTML_REPORT_DETAIL_SCRIPT = """<script>
+(function () {
+  "use strict";
+  var ROW_HEIGHT = 24;
+  // Browsers cap element height, e.g. Firefox at about 17.9M px, so scroll height is capped and scroll position is
+  // mapped to rows proportionally once rows do not fit.
+  var MAX_SCROLL_HEIGHT = 8000000;
+  var data = JSON.parse(document.getElementById("driftctl-details").textContent);
+  var columns = data.columns, width = columns.length, strings = data.strings;
+  var refs = Int32Array.from(data.rows), count = refs.length / width;
+  data = null;
+  // Rank of each string in sorted order, rows are sorted by comparing ranks of string table references.
+  var ranks = new Int32Array(strings.length);
+  strings.map(function (value, ref) { return ref; }).sort(function (a, b) {
+    return strings[a] < strings[b] ? -1 : (strings[a] > strings[b] ? 1 : 0);
+  }).forEach(function (ref, rank) { ranks[ref] = rank; });
+  var rows = new Int32Array(count), view = rows, sortColumn = -1, sortAscending = true;
+  var header = document.getElementById("driftctl-header"), viewport = document.getElementById("driftctl-viewport");
+  var spacer = document.getElementById("driftctl-spacer"), visible = document.getElementById("driftctl-rows");
+  var filter = document.getElementById("driftctl-filter"), status = document.getElementById("driftctl-status");
+
+  function escapeHtml(value) {
+    return value.replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;").replace(/"/g, "&quot;");
+  }
+
+  function render() {
+    var scrollTop = viewport.scrollTop, height = viewport.clientHeight;
+    var rowsHeight = view.length * ROW_HEIGHT, scrollHeight = Math.min(rowsHeight, MAX_SCROLL_HEIGHT);
+    var top = scrollHeight > height ? scrollTop * (rowsHeight - height) / (scrollHeight - height) : scrollTop;
+    var first = Math.max(0, Math.min(view.length - 1, Math.floor(top / ROW_HEIGHT)));
+    var last = Math.min(view.length, first + Math.ceil(height / ROW_HEIGHT) + 1);
+    var html = [];
+    for (var i = first; i < last; i++) {
+      var offset = view[i] * width;
+      for (var column = 0; column < width; column++) {
+        var value = escapeHtml(strings[refs[offset + column]]);
+        html.push("<div title=\\"" + value + "\\">" + value + "</div>");
+      }
+    }
+    visible.className = "grid";
+    visible.style.transform = "translateY(" + (scrollTop - top + first * ROW_HEIGHT) + "px)";
+    visible.innerHTML = html.join("");
+  }
+
+  function update() {
+    var query = filter.value.toLowerCase();
+    if (query) {
+      var matches = new Uint8Array(strings.length);
+      for (var ref = 0; ref < strings.length; ref++) {
+        matches[ref] = strings[ref].toLowerCase().indexOf(query) >= 0 ? 1 : 0;
+      }
+      var filtered = new Int32Array(count), length = 0;
+      for (var row = 0; row < count; row++) {
+        for (var column = 0; column < width; column++) {
+          if (matches[refs[row * width + column]]) {
+            filtered[length++] = row;
+            break;
+          }
+        }
+      }
+      view = filtered.subarray(0, length);
+    } else {
+      view = rows.slice();
+    }
+    if (sortColumn >= 0) {
+      var direction = sortAscending ? 1 : -1;
+      view.sort(function (a, b) {
+        return direction * (ranks[refs[a * width + sortColumn]] - ranks[refs[b * width + sortColumn]]) || a - b;
+      });
+    }
+    header.childNodes.forEach(function (cell, column) {
+      cell.textContent = columns[column] + (column === sortColumn ? (sortAscending ? " \\u25b2" : " \\u25bc") : "");
+    });
+    status.textContent = view.length + " of " + count + " resource(s)";
+    spacer.style.height = Math.min(view.length * ROW_HEIGHT, MAX_SCROLL_HEIGHT) + "px";
+    render();
+  }
+
+  for (var row = 0; row < count; row++) {
+    rows[row] = row;
+  }
+  columns.forEach(function (name, column) {
+    var cell = document.createElement("div");
+    cell.addEventListener("click", function () {
+      sortAscending = column === sortColumn ? !sortAscending : true;
+      sortColumn = column;
+      update();
+    });
+    header.appendChild(cell);
+  });
+  var timer = null;
+  filter.addEventListener("input", function () {
+    clearTimeout(timer);
+    timer = setTimeout(update, 200);
+  });
+  viewport.addEventListener("scroll", function () { window.requestAnimationFrame(render); });
+  window.addEventListener("resize", render);
+  update();
+})();
+</script>
+"""
+HTML_REPORT_TAIL = """</body>
+</html>
+"""
+# Number of detail rows buffered before being written to html report.
+HTML_REPORT_WRITE_BATCH_ROWS = 1024
+
+
+def _to_html_json(value):
+    """
+    Serialize value to compact json which can be embedded in html script element, "<" is escaped so that "</script>"
+    or "<!--" in resource ids can not end the script element.
+    :param value: json serializable value
+    :return: str
+    """
+    return json.dumps(value, separators=(",", ":")).replace("<", "\\u003c")
 
+
+def _get_html_table(headers, data):
+    """
+    Get html table for small tables, like summary and changelog index.
+    :param headers: list of column headers
+    :param data: list of rows
+    :return: str
+    """
+    header_html = "".join(f"<th>{html.escape(str(header))}</th>" for header in headers)
+    rows_html = "".join("<tr>" + "".join(f"<td>{html.escape(str(value))}</td>" for value in row) + "</tr>\n"
+                        for row in data)
+    return f"<table>\n<tr>{header_html}</tr>\n{rows_html}</table>\n"
+
+
+def print_html_detail_view(writer, detail_rows, headers):
+    """
+    Stream detail view rows to html report as json payload, with each value replaced by reference to a string
+    table, followed by the script rendering the detail view. Rows are flattened to a single list of references, and
+    string table is written after the rows, so only unique values are held in memory.
+    :param writer: IO Handler for writing output.
+    :param detail_rows: iterable of detail rows as generated by get_detail_rows.
+    :param headers: list of column headers
+    """
+    writer.write(HTML_REPORT_DETAIL_VIEW)
+    writer.write(f'<script type="application/json" id="driftctl-details">{{"columns":{_to_html_json(headers)},'
+                 f'"rows":[')
+    strings: dict = {}
+    batch = []
+    separator = ""
+    for row in detail_rows:
+        batch.append(",".join(str(strings.setdefault(value or "", len(strings))) for value in row))
+        if len(batch) >= HTML_REPORT_WRITE_BATCH_ROWS:
+            writer.write(separator + ",".join(batch))
+            separator = ","
+            batch = []
+    if batch:
+        writer.write(separator + ",".join(batch))
+    writer.write(f'],"strings":{_to_html_json(list(strings))}}}</script>\n')
+    writer.write(HTML_REPORT_DETAIL_SCRIPT)
+
+
+def get_summary_table(summary: DriftctlSummary):
+    """
+    Get summary table rows for summary.
+    :param summary: DriftctlSummary
+    :return: List of [description, count]
+    """
+    return [
+        ["Coverage", f"{summary.coverage}%"],
+        ["Found resource(s)", summary.total_resources],
+        ["Resource(s) managed by Terraform", summary.total_managed],
+        ["Resource(s) found in a Terraform state but missing on the cloud provider", summary.total_missing],
+        ["Resource(s) not managed by Terraform", summary.total_unmanaged],
+        ["Resource(s) out of sync with Terraform state", summary.total_changed]
+    ]
+
+
+def _open_output_writer(output_file_mode: DriftctlOutputMode, output_file_name: str,
+                        output_file_format: DriftctlOutputFormat):
+    """
+    Open file to write output to, falling back to STDOUT if file can not be opened.
+    :param output_file_mode: DriftctlOutputMode
+    :param output_file_name: file name, .csv or .html is appended for CSV or HTML format if missing.
+    :param output_file_format: DriftctlOutputFormat
+    :return: IO Handler for writing output.
+    """
     writer = sys.stdout
     try:
         if output_file_mode == DriftctlOutputMode.FILE:
             if output_file_format == DriftctlOutputFormat.CSV:
                 if not output_file_name.lower().endswith(".csv"):
                     output_file_name = f"{output_file_name}.csv"
-                writer = open(output_file_name, "w", encoding="utf-8")
-            elif output_file_format == DriftctlOutputFormat.TABLE:
-                writer = open(output_file_name, "w", encoding="utf-8")
+            elif output_file_format == DriftctlOutputFormat.HTML:
+                if not output_file_name.lower().endswith((".html", ".htm")):
+                    output_file_name = f"{output_file_name}.html"
+            writer = open(output_file_name, "w", encoding="utf-8")  # pylint: disable=consider-using-with
     except FileNotFoundError:
         print(f"Error: Cannot open file {output_file_name} to write data", file=sys.stderr)
         print("Warn: Output will be written to STDOUT instead", file=sys.stderr)
-    if output_file_format == DriftctlOutputFormat.TABLE:
+    return writer
+
+
+# Disabling pylint argument count checks on below function as output options are passed as keyword arguments.
+def print_driftctl_op(output: DriftctlOutput, print_details: bool = False,  # pylint: disable=R0913,R0917
+                      output_file_mode: DriftctlOutputMode = DriftctlOutputMode.STDOUT,
+                      output_file_name: str = "",
+                      output_file_format: DriftctlOutputFormat = DriftctlOutputFormat.TABLE,
+                      sort_by: Optional[List[str]] = None,
+                      sort_max_rows_in_memory: int = DEFAULT_SORT_MAX_ROWS_IN_MEMORY,
+                      print_changelog: bool = False):
+    """
+    Print details of output in tabular, csv or html format on provided file mode.
+
+    :param output: Driftctl output object.
+    :param print_details: If True, print details TABLE, CSV or HTML after printing Summary details.
+    :param output_file_mode: DriftctlOutputMode, defaults to STDOUT
+    :param output_file_name: if output_file_mode is not STDOUT, then output will be written to the file name provided.
+    if output_file_mode is CSV, then output_file_name should end with csv, else .csv will be appended to the
+    provided output file name, similarly .html is appended for HTML.
+    :param output_file_format: DriftctlOutputFormat, defaults to TABLE.
+    :param sort_by: List of detail columns (DETAIL_SORT_COLUMNS) to sort detail view by, if empty detail view is
+    printed in the order resources were found.
+    :param sort_max_rows_in_memory: maximum number of detail rows sorted in memory, beyond which sorted runs are
+    spilled to temporary files and merged.
+    :param print_changelog: If True, print changelog index of changed attribute paths after Summary and details.
+
+    """
+    # Generate table for summary
+    summary_headers = ["Summary", "count"]
+    summary = output.get_summary()
+    summary_table = get_summary_table(summary)
+
+    writer = _open_output_writer(output_file_mode, output_file_name, output_file_format)
+    if output_file_format == DriftctlOutputFormat.HTML:
+        writer.write(HTML_REPORT_HEAD + _get_html_table(summary_headers, summary_table))
+    elif output_file_format == DriftctlOutputFormat.TABLE:
         print_data_table(writer=writer, data=summary_table, headers=summary_headers)
     elif output_file_format == DriftctlOutputFormat.CSV:
         print_data_csv(writer=writer, data=summary_table, headers=summary_headers)
 
     # Print detail view if there are resources missing coverage.
     if summary.coverage < 100 and print_details:
-        # Added/Print separator between summary and detail view.
-        print(
-            "\n--------------------------------------------------------------------------------------------------------"
-            "-------------------------------------------------------------------\n", file=writer)
-        detail_headers = ["Category", "Resource Id", "Resource Type", "Region", "Account Id", "Source"]
-        detail_table = []
-        for missing in output.missing.values():
-            _id = missing.id
-            _source = missing.source
-            if output_file_format == DriftctlOutputFormat.TABLE:
-                _id = "\n".join(textwrap.wrap(_id))
-                _source = "\n".join(textwrap.wrap(_source, width=40))
-            detail_table.append(["Missing", _id, missing.type, missing.region, missing.account_id, _source])
-
-        for unmanaged in output.unmanaged.values():
-            _id = unmanaged.id
-            _source = unmanaged.source
-            if output_file_format == DriftctlOutputFormat.TABLE:
-                _id = "\n".join(textwrap.wrap(_id))
-                _source = "\n".join(textwrap.wrap(_source, width=40))
-            detail_table.append(["Unmanaged", _id, unmanaged.type, unmanaged.region, unmanaged.account_id, _source])
-        for diff in output.differences.values():
-            _id = diff.id
-            _source = diff.source
-            if output_file_format == DriftctlOutputFormat.TABLE:
-                _id = "\n".join(textwrap.wrap(_id))
-                _source = "\n".join(textwrap.wrap(_source, width=40))
-            detail_table.append(["Changed", _id, diff.type, diff.region, diff.account_id, _source])
+        if output_file_format != DriftctlOutputFormat.HTML:
+            print_separator(writer)
+        print_detail_view(writer, output, output_file_format, sort_by, sort_max_rows_in_memory)
+
+    if print_changelog and output.changelog_index.changes:
+        if output_file_format != DriftctlOutputFormat.HTML:
+            print_separator(writer)
+        print_changelog_index(writer, output.changelog_index, output_file_format)
+    if output_file_format == DriftctlOutputFormat.HTML:
+        writer.write(HTML_REPORT_TAIL)
+    writer.close()
 
+
+def print_approximate_driftctl_op(output: DriftctlApproximateOutput, print_details: bool = False,
+                                  output_file_mode: DriftctlOutputMode = DriftctlOutputMode.STDOUT,
+                                  output_file_name: str = "",
+                                  output_file_format: DriftctlOutputFormat = DriftctlOutputFormat.TABLE):
+    """
+    Print approximate summary of output, and approximate summary of each account and region if print_details is
+    True, in tabular, csv or html format on provided file mode.
+
+    :param output: DriftctlApproximateOutput
+    :param print_details: If True, print summary of each account and region after approximate summary.
+    :param output_file_mode: DriftctlOutputMode, defaults to STDOUT
+    :param output_file_name: if output_file_mode is not STDOUT, then output will be written to the file name provided.
+    :param output_file_format: DriftctlOutputFormat, defaults to TABLE.
+    """
+    tables = [(["Approximate summary", "count"], get_summary_table(output.get_summary()))]
+    if print_details:
+        source_rows = []
+        for (account_id, region), summary in sorted(output.get_source_summaries().items()):
+            source_rows.append([account_id, region, f"{summary.coverage}%", summary.total_resources,
+                                summary.total_managed, summary.total_missing, summary.total_unmanaged,
+                                summary.total_changed])
+        tables.append((["Account Id", "Region", "Coverage", "Found", "Managed", "Missing", "Unmanaged", "Changed"],
+                       source_rows))
+    writer = _open_output_writer(output_file_mode, output_file_name, output_file_format)
+    if output_file_format == DriftctlOutputFormat.HTML:
+        writer.write(HTML_REPORT_HEAD)
+    for index, (headers, table) in enumerate(tables):
+        if output_file_format == DriftctlOutputFormat.HTML:
+            writer.write(_get_html_table(headers, table))
+            continue
+        if index > 0:
+            print_separator(writer)
         if output_file_format == DriftctlOutputFormat.TABLE:
-            print_data_table(writer=writer, data=detail_table, headers=detail_headers)
+            print_data_table(writer=writer, data=table, headers=headers)
         elif output_file_format == DriftctlOutputFormat.CSV:
-            print_data_csv(writer=writer, data=detail_table, headers=detail_headers)
+            print_data_csv(writer=writer, data=table, headers=headers)
+    if output_file_format == DriftctlOutputFormat.HTML:
+        writer.write(HTML_REPORT_TAIL)
     writer.close()
 
 
+def get_drift_metrics(output: DriftctlOutput):
+    """
+    Count resources cached on output for each category, account id, region and resource type, in a single pass.
+    :param output: Driftctl output object.
+    :return: dict of (category, account id, region, resource type) to count
+    """
+    counts: dict = {}
+    for resource_type in DriftctlResourceType:
+        category = METRICS_CATEGORIES[resource_type]
+        for resource in output.get_resources(resource_type).values():
+            # Managed resources are held as labels only, unless managed details are cached.
+            labels = resource if isinstance(resource, tuple) else \
+                (resource.account_id or "", resource.region or "", resource.type or "")
+            key = (category,) + labels
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def _escape_label_value(value: str):
+    """
+    Escape OpenMetrics label value.
+    :param value: label value
+    :return: str
+    """
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def write_openmetrics(output: DriftctlOutput, file_name: str):
+    """
+
+    Write coverage and resource counts of output as gauges in OpenMetrics text format, e.g. for node_exporter textfile
+    collector. File is written to a temporary file in the same directory and renamed, so readers never see a
+    partially written file.
+
+    :param output: Driftctl output object.
+    :param file_name: metrics file name, should end with .prom for node_exporter textfile collector.
+    """
+    counts = get_drift_metrics(output)
+    source_totals: dict = {}
+    for (category, account_id, region, _), count in counts.items():
+        totals = source_totals.setdefault((account_id, region), {})
+        totals[f"total_{category}"] = totals.get(f"total_{category}", 0) + count
+
+    temp_fd, temp_file_name = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_name)), prefix=".",
+                                               suffix=".tmp")
+    try:
+        with os.fdopen(temp_fd, "w", encoding="utf-8") as writer:
+            writer.write("# HELP driftctl_coverage_percent Percentage of resources managed by Terraform.\n"
+                         "# TYPE driftctl_coverage_percent gauge\n"
+                         f"driftctl_coverage_percent {output.get_summary().coverage}\n"
+                         "# HELP driftctl_source_coverage_percent Percentage of resources managed by Terraform "
+                         "for each account and region.\n"
+                         "# TYPE driftctl_source_coverage_percent gauge\n")
+            for (account_id, region), totals in sorted(source_totals.items()):
+                writer.write(f'driftctl_source_coverage_percent{{account_id="{_escape_label_value(account_id)}",'
+                             f'region="{_escape_label_value(region)}"}} {DriftctlSummary(**totals).coverage}\n')
+            writer.write("# HELP driftctl_resources Number of resources for each category, account, region and "
+                         "resource type.\n"
+                         "# TYPE driftctl_resources gauge\n")
+            for (category, account_id, region, _type), count in sorted(counts.items()):
+                writer.write(f'driftctl_resources{{category="{category}",account_id="{_escape_label_value(account_id)}",'
+                             f'region="{_escape_label_value(region)}",resource_type="{_escape_label_value(_type)}"}} '
+                             f'{count}\n')
+            writer.write("# EOF\n")
+            writer.flush()
+            os.fsync(writer.fileno())
+        os.chmod(temp_file_name, 0o644)
+        os.replace(temp_file_name, file_name)
+    except BaseException:
+        if os.path.exists(temp_file_name):
+            os.unlink(temp_file_name)
+        raise
+
+
+def _write_varint(buffer: bytearray, value: int):
+    """
+    Append unsigned integer to buffer using LEB128 variable length encoding.
+    :param buffer: bytearray to append encoded value to.
+    :param value: non-negative integer.
+    """
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data: bytes, offset: int):
+    """
+    Read LEB128 encoded unsigned integer from data starting at offset.
+    :param data: bytes to read from.
+    :param offset: position of first byte of encoded value.
+    :return: value(int), offset of next byte(int)
+    """
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(data):
+            raise ValueError("Truncated driftctl snapshot")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class DriftctlSnapshotEncoder:
+    """
+    Encoder for binary snapshot of DriftctlOutput. Strings (ids, types, sources, regions, account ids and change logs)
+    are interned in a string table and referenced by index, which keeps snapshots compact as most of these values
+    repeat across resources.
+    """
+
+    def __init__(self):
+        self.strings = {}
+        self.sections = bytearray()
+
+    def get_string_ref(self, value):
+        """
+        Get string table reference for value, 0 is reserved for None.
+        :param value: str or None
+        :return: int
+        """
+        if value is None:
+            return 0
+        if value not in self.strings:
+            self.strings[value] = len(self.strings) + 1
+        return self.strings[value]
+
+    def add_section(self, tag: int, payload: bytearray):
+        """
+        Add tagged section to snapshot body, readers skip sections with unknown tags.
+        :param tag: section tag
+        :param payload: section payload
+        """
+        _write_varint(self.sections, tag)
+        _write_varint(self.sections, len(payload))
+        self.sections.extend(payload)
+
+    def add_resources(self, resource_type: DriftctlResourceType, resources):
+        """
+        Add section holding resources of resource_type.
+        :param resource_type: DriftctlResourceType, value of enum is used as section tag.
+        :param resources: iterable of DriftctlResourceMin
+        """
+        payload = bytearray()
+        resources = list(resources)
+        _write_varint(payload, len(resources))
+        for resource in resources:
+            change_log = None if resource.change_log is None else json.dumps(resource.change_log, separators=(",", ":"))
+            for value in (resource.id, resource.type, resource.source, resource.region, resource.account_id, change_log):
+                _write_varint(payload, self.get_string_ref(value))
+        self.add_section(resource_type.value, payload)
+
+    def add_resource_keys(self, resource_keys: dict):
+        """
+        Add section holding sorted managed resource keys, delta encoded, each followed by index of its labels in
+        the labels table at the start of the section.
+        :param resource_keys: dict of int resource key to (account id, region, resource type) labels
+        """
+        payload = bytearray()
+        labels_index: dict = {}
+        for labels in resource_keys.values():
+            labels_index.setdefault(labels, len(labels_index))
+        _write_varint(payload, len(labels_index))
+        for labels in labels_index:
+            for value in labels:
+                _write_varint(payload, self.get_string_ref(value))
+        _write_varint(payload, len(resource_keys))
+        previous = 0
+        for resource_key in sorted(resource_keys):
+            _write_varint(payload, resource_key - previous)
+            _write_varint(payload, labels_index[resource_keys[resource_key]])
+            previous = resource_key
+        self.add_section(SNAPSHOT_MANAGED_KEYS_TAG, payload)
+
+    def add_changelog_index(self, changelog_index: DriftctlChangelogIndex):
+        """
+        Add section holding changelog index entries of resource types which are not global, and section holding
+        attribute paths of each global resource, so that changes of global resources already merged for an account
+        can be skipped while merging.
+        :param changelog_index: DriftctlChangelogIndex
+        """
+        payload = bytearray()
+        entries = [(key, changes) for key, changes in changelog_index.changes.items()
+                   if not is_global_resource_type(key[0])]
+        _write_varint(payload, len(entries))
+        for (resource_type, path), changes in entries:
+            _write_varint(payload, self.get_string_ref(resource_type))
+            _write_varint(payload, len(path))
+            for part in path:
+                _write_varint(payload, self.get_string_ref(part))
+            _write_varint(payload, changes)
+            resource_keys = changelog_index.resources[(resource_type, path)]
+            _write_varint(payload, len(resource_keys))
+            for account_id, resource_id in resource_keys:
+                _write_varint(payload, self.get_string_ref(account_id))
+                _write_varint(payload, self.get_string_ref(resource_id))
+        self.add_section(SNAPSHOT_CHANGELOG_INDEX_TAG, payload)
+        payload = bytearray()
+        _write_varint(payload, len(changelog_index.global_resource_paths))
+        for resource_key, paths in changelog_index.global_resource_paths.items():
+            for value in resource_key:
+                _write_varint(payload, self.get_string_ref(value))
+            _write_varint(payload, len(paths))
+            for path in paths:
+                _write_varint(payload, len(path))
+                for part in path:
+                    _write_varint(payload, self.get_string_ref(part))
+        self.add_section(SNAPSHOT_GLOBAL_CHANGELOG_TAG, payload)
+
+    def encode(self):
+        """
+        Get snapshot bytes, header followed by zlib compressed string table and sections.
+        :return: bytes
+        """
+        body = bytearray()
+        _write_varint(body, len(self.strings))
+        for value in self.strings:
+            encoded = value.encode("utf-8")
+            _write_varint(body, len(encoded))
+            body.extend(encoded)
+        body.extend(self.sections)
+        return SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION) + zlib.compress(bytes(body))
+
+
+def dump_driftctl_snapshot(output: DriftctlOutput, file_name: str):
+    """
+    Write binary snapshot of Driftctl output to file, snapshot can be merged with other snapshots using
+    merge_driftctl_snapshots.
+
+    :param output: Driftctl output object.
+    :param file_name: snapshot file name.
+    """
+    encoder = DriftctlSnapshotEncoder()
+    for resource_type in DriftctlResourceType:
+        if resource_type == DriftctlResourceType.MANAGED and not output.managed_details:
+            encoder.add_resource_keys(output.managed)
+        else:
+            encoder.add_resources(resource_type, output.get_resources(resource_type).values())
+    encoder.add_changelog_index(output.changelog_index)
+    with open(file_name, "wb") as snapshot_file:
+        snapshot_file.write(encoder.encode())
+
+
+def _decode_resources(payload: bytes, strings: list, resource_type: DriftctlResourceType, output: DriftctlOutput,
+                      added_global_resources: set):
+    """
+    Decode resources section of snapshot and add resources to output, global resources already added to output
+    for the same account are skipped, same as while combining driftctl scan output json files.
+    :param payload: section payload
+    :param strings: snapshot string table, index 0 being None.
+    :param resource_type: DriftctlResourceType of resources in the section.
+    :param output: Driftctl output object to add resources to.
+    :param added_global_resources: set to add (account id, resource type, resource id) of global changed resources
+    added to output from this snapshot.
+    """
+    count, offset = _read_varint(payload, 0)
+    for _ in range(count):
+        values = []
+        for _ in range(6):
+            ref, offset = _read_varint(payload, offset)
+            values.append(strings[ref])
+        change_log = None if values[5] is None else json.loads(values[5])
+        resource = DriftctlResourceMin(id=values[0], type=values[1], source=values[2], region=values[3],
+                                       account_id=values[4], change_log=change_log)
+        if is_global_resource_type(resource.type):
+            if not _add_global_resource(output.global_resource_index, resource.account_id, resource_type,
+                                        resource.type, resource.id):
+                continue
+            if resource_type == DriftctlResourceType.DIFF:
+                added_global_resources.add((resource.account_id or "", resource.type, resource.id))
+        if resource_type == DriftctlResourceType.DIFF:
+            # Changelog of changed resources is already indexed in changelog index section.
+            output.add_changed_resource(resource, index_change_log=False)
+        else:
+            output.add_resource(resource_type, resource)
+
+
+def _decode_changelog_index(payload: bytes, strings: list, output: DriftctlOutput):
+    """
+    Decode changelog index section of snapshot and add entries to changelog index of output.
+    :param payload: section payload
+    :param strings: snapshot string table, index 0 being None.
+    :param output: Driftctl output object to add changelog index entries to.
+    """
+    count, offset = _read_varint(payload, 0)
+    for _ in range(count):
+        ref, offset = _read_varint(payload, offset)
+        resource_type = strings[ref]
+        path_length, offset = _read_varint(payload, offset)
+        path = []
+        for _ in range(path_length):
+            ref, offset = _read_varint(payload, offset)
+            path.append(strings[ref])
+        changes, offset = _read_varint(payload, offset)
+        resource_count, offset = _read_varint(payload, offset)
+        resource_keys = []
+        for _ in range(resource_count):
+            account_ref, offset = _read_varint(payload, offset)
+            ref, offset = _read_varint(payload, offset)
+            resource_keys.append((strings[account_ref], strings[ref]))
+        output.changelog_index.add_entry(resource_type, path, resource_keys, changes)
+
+
+def _decode_global_changelog(payload: bytes, strings: list, output: DriftctlOutput, added_global_resources: set):
+    """
+    Decode section of attribute paths of each global changed resource, and add these to changelog index of output,
+    unless the resource was already added to output for the same account before this snapshot.
+    :param payload: section payload
+    :param strings: snapshot string table, index 0 being None.
+    :param output: Driftctl output object to add changelog index entries to.
+    :param added_global_resources: (account id, resource type, resource id) of global changed resources added to
+    output from this snapshot.
+    """
+    count, offset = _read_varint(payload, 0)
+    for _ in range(count):
+        values = []
+        for _ in range(3):
+            ref, offset = _read_varint(payload, offset)
+            values.append(strings[ref])
+        path_count, offset = _read_varint(payload, offset)
+        paths = []
+        for _ in range(path_count):
+            path_length, offset = _read_varint(payload, offset)
+            path = []
+            for _ in range(path_length):
+                ref, offset = _read_varint(payload, offset)
+                path.append(strings[ref])
+            paths.append(path)
+        account_id, resource_type, resource_id = values[0], values[1], values[2]
+        if (account_id or "", resource_type, resource_id) not in added_global_resources and not _add_global_resource(
+                output.global_resource_index, account_id, DriftctlResourceType.DIFF, resource_type, resource_id):
+            continue
+        output.changelog_index.add_resource_paths(account_id, resource_type, resource_id, paths)
+
+
+def _decode_resource_keys(payload: bytes, strings: list, output: DriftctlOutput):
+    """
+    Decode managed resource keys section of snapshot, along with labels of each key, and add keys to output.
+    :param payload: section payload
+    :param strings: snapshot string table, index 0 being None.
+    :param output: Driftctl output object to add resource keys to.
+    """
+    labels_count, offset = _read_varint(payload, 0)
+    labels_table = []
+    for _ in range(labels_count):
+        labels = []
+        for _ in range(3):
+            ref, offset = _read_varint(payload, offset)
+            labels.append(strings[ref])
+        labels_table.append(labels)
+    count, offset = _read_varint(payload, offset)
+    resource_key = 0
+    for _ in range(count):
+        delta, offset = _read_varint(payload, offset)
+        labels_ref, offset = _read_varint(payload, offset)
+        resource_key += delta
+        output.add_managed_resource_key(resource_key, *labels_table[labels_ref])
+
+
+def load_driftctl_snapshot(file_name: str, output: Optional[DriftctlOutput] = None):
+    """
+    Read binary snapshot of Driftctl output written by dump_driftctl_snapshot, resources from snapshot are added
+    to output object provided, which allows multiple snapshots to be merged with the same semantics used while combining
+    driftctl scan output json files.
+
+    :param file_name: snapshot file name.
+    :param output: Driftctl output object to add resources to, new object is created if None.
+    :return: DriftctlOutput
+    """
+    if output is None:
+        output = DriftctlOutput()
+    with open(file_name, "rb") as snapshot_file:
+        data = snapshot_file.read()
+    if len(data) < SNAPSHOT_HEADER.size:
+        raise ValueError(f"File {file_name} is not a driftctl snapshot")
+    magic, version = SNAPSHOT_HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError(f"File {file_name} is not a driftctl snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported driftctl snapshot version {version} in file {file_name}")
+    body = zlib.decompress(data[SNAPSHOT_HEADER.size:])
+    string_count, offset = _read_varint(body, 0)
+    strings: List[Optional[str]] = [None]
+    for _ in range(string_count):
+        length, offset = _read_varint(body, offset)
+        strings.append(body[offset:offset + length].decode("utf-8"))
+        offset += length
+    resource_types = {resource_type.value: resource_type for resource_type in DriftctlResourceType}
+    added_global_resources: set = set()
+    while offset < len(body):
+        tag, offset = _read_varint(body, offset)
+        length, offset = _read_varint(body, offset)
+        if tag in resource_types:
+            _decode_resources(body[offset:offset + length], strings, resource_types[tag], output, added_global_resources)
+        elif tag == SNAPSHOT_MANAGED_KEYS_TAG:
+            _decode_resource_keys(body[offset:offset + length], strings, output)
+        elif tag == SNAPSHOT_CHANGELOG_INDEX_TAG:
+            _decode_changelog_index(body[offset:offset + length], strings, output)
+        elif tag == SNAPSHOT_GLOBAL_CHANGELOG_TAG:
+            _decode_global_changelog(body[offset:offset + length], strings, output, added_global_resources)
+        offset += length
+    return output
+
+
+def merge_driftctl_snapshots(files: List[str], keep_change_log: bool = True, changelog_depth: Optional[int] = None):
+    """
+
+    Merge binary snapshots of Driftctl output, snapshots which can not be read are reported and ignored.
+
+    :param files: List of snapshot file names.
+    :param keep_change_log: if False, changelog of changed resources is only kept in changelog index of the output.
+    :param changelog_depth: maximum attribute path depth for changelog index of the output.
+    :return: DriftctlOutput
+    """
+    output = DriftctlOutput(keep_change_log=keep_change_log, changelog_depth=changelog_depth)
+    for in_file in files:
+        try:
+            load_driftctl_snapshot(in_file, output)
+        except (OSError, ValueError, IndexError, zlib.error):
+            print(f"Warning : Not able to read driftctl snapshot file {in_file}, "
+                  f"data for this file will be ignored.", file=sys.stderr)
+    return output
+
+
+def _write_sketch(body: bytearray, sketch: DriftctlSketch):
+    """
+    Append sketch to sketch file body, sparse sketch as number of entries followed by delta encoded entries, else a
+    zero followed by registers.
+    :param body: sketch file body.
+    :param sketch: DriftctlSketch
+    """
+    if not sketch.is_sparse():
+        _write_varint(body, 0)
+        body.extend(sketch.get_registers())
+        return
+    _write_varint(body, len(sketch.entries) + 1)
+    previous = 0
+    for entry in sketch.entries:
+        _write_varint(body, entry - previous)
+        previous = entry
+
+
+def _read_sketch(body: bytes, offset: int, precision: int):
+    """
+    Read sketch written by _write_sketch from sketch file body.
+    :param body: decompressed sketch file body.
+    :param offset: position of sketch.
+    :param precision: precision of sketch.
+    :return: DriftctlSketch, offset of next byte(int)
+    """
+    count, offset = _read_varint(body, offset)
+    if count == 0:
+        return DriftctlSketch(precision, body[offset:offset + (1 << precision)]), offset + (1 << precision)
+    sketch = DriftctlSketch(precision)
+    entry = 0
+    for _ in range(count - 1):
+        delta, offset = _read_varint(body, offset)
+        entry += delta
+        sketch.update_register(entry >> SKETCH_RANK_BITS, entry & SKETCH_RANK_MASK)
+    return sketch, offset
+
+
+def dump_driftctl_sketches(output: DriftctlApproximateOutput, file_name: str):
+    """
+    Write sketches of approximate Driftctl output to file, sketches can be merged with other sketches using
+    merge_driftctl_sketches.
+
+    :param output: DriftctlApproximateOutput
+    :param file_name: sketch file name.
+    """
+    body = bytearray()
+    _write_varint(body, output.precision)
+    _write_varint(body, output.source_precision)
+    for resource_type in DriftctlResourceType:
+        _write_sketch(body, output.sketches[resource_type])
+    _write_varint(body, len(output.source_sketches))
+    for (account_id, region), sketches in output.source_sketches.items():
+        for value in (account_id, region):
+            encoded = value.encode("utf-8")
+            _write_varint(body, len(encoded))
+            body.extend(encoded)
+        for resource_type in DriftctlResourceType:
+            _write_sketch(body, sketches[resource_type])
+    with open(file_name, "wb") as sketch_file:
+        sketch_file.write(SKETCH_HEADER.pack(SKETCH_MAGIC, SKETCH_VERSION) + zlib.compress(bytes(body)))
+
+
+def _read_sketch_label(body: bytes, offset: int):
+    """
+    Read length prefixed utf-8 account id or region label from sketch file body.
+    :param body: decompressed sketch file body.
+    :param offset: position of label length.
+    :return: label(str), offset of next byte(int)
+    """
+    length, offset = _read_varint(body, offset)
+    return body[offset:offset + length].decode("utf-8"), offset + length
+
+
+def load_driftctl_sketches(file_name: str, output: Optional[DriftctlApproximateOutput] = None):
+    """
+    Read sketches written by dump_driftctl_sketches, and merge these into output object provided.
+
+    :param file_name: sketch file name.
+    :param output: DriftctlApproximateOutput to merge sketches into, new object is created if None.
+    :return: DriftctlApproximateOutput
+    """
+    with open(file_name, "rb") as sketch_file:
+        data = sketch_file.read()
+    if len(data) < SKETCH_HEADER.size or SKETCH_HEADER.unpack_from(data)[0] != SKETCH_MAGIC:
+        raise ValueError(f"File {file_name} is not a driftctl sketch file")
+    version = SKETCH_HEADER.unpack_from(data)[1]
+    if version > SKETCH_VERSION:
+        raise ValueError(f"Unsupported driftctl sketch file version {version} in file {file_name}")
+    body = zlib.decompress(data[SKETCH_HEADER.size:])
+    precision, offset = _read_varint(body, 0)
+    source_precision, offset = _read_varint(body, offset)
+    loaded = DriftctlApproximateOutput(precision=precision, source_precision=source_precision)
+    for resource_type in DriftctlResourceType:
+        loaded.sketches[resource_type], offset = _read_sketch(body, offset, precision)
+    source_count, offset = _read_varint(body, offset)
+    for _ in range(source_count):
+        account_id, offset = _read_sketch_label(body, offset)
+        region, offset = _read_sketch_label(body, offset)
+        sketches = loaded.get_source_sketches(account_id, region)
+        for resource_type in DriftctlResourceType:
+            sketches[resource_type], offset = _read_sketch(body, offset, source_precision)
+    if output is None:
+        return loaded
+    output.merge(loaded)
+    return output
+
+
+def merge_driftctl_sketches(files: List[str]):
+    """
+
+    Merge sketch files of approximate Driftctl output, files which can not be read, or have sketches of different
+    precision than the first file read, are reported and ignored.
+
+    :param files: List of sketch file names.
+    :return: DriftctlApproximateOutput
+    """
+    output = None
+    for in_file in files:
+        try:
+            output = load_driftctl_sketches(in_file, output)
+        except (OSError, ValueError, IndexError, zlib.error):
+            print(f"Warning : Not able to read driftctl sketch file {in_file}, "
+                  f"data for this file will be ignored.", file=sys.stderr)
+    return output if output is not None else DriftctlApproximateOutput()
+
+
+def _parse_sort_by(value: str):
+    """
+    Parse comma separated list of detail view sort columns
+    :param value:
+    :return: list of column names
+    """
+    columns = [column.strip().lower() for column in value.split(",") if column.strip()]
+    for column in columns:
+        if column not in DETAIL_SORT_COLUMNS:
+            raise argparse.ArgumentTypeError(f"invalid sort column {column}, choose from {','.join(DETAIL_SORT_COLUMNS)}")
+    return columns
+
+
+def _add_output_arguments(parser, suppress_defaults: bool = False):
+    """
+    Add arguments controlling output of combined results to parser
+    :param parser:
+    :param suppress_defaults: if True, defaults are suppressed, so that arguments provided before a sub command are
+    not overridden by defaults of the sub command parser.
+    :return:
+    """
+
+    def default(value):
+        return argparse.SUPPRESS if suppress_defaults else value
+
+    parser.add_argument("--detailed", dest="detailed", default=default(False), action='store_true')
+    parser.add_argument("--output", "-o", dest="output_file", default=default("STDOUT"))
+    parser.add_argument("--output-format", "-p", dest="output_format",
+                        choices=[output_format.name for output_format in DriftctlOutputFormat], default=default("TABLE"))
+    parser.add_argument("--sort-by", dest="sort_by", type=_parse_sort_by, default=default([]),
+                        help=f"Comma separated list of columns to sort detail view by, from {','.join(DETAIL_SORT_COLUMNS)}.")
+    parser.add_argument("--sort-memory-rows", dest="sort_max_rows_in_memory", type=int,
+                        default=default(DEFAULT_SORT_MAX_ROWS_IN_MEMORY),
+                        help="Maximum number of detail rows sorted in memory, larger outputs are sorted using temporary files.")
+    parser.add_argument("--changelog-summary", dest="changelog_summary", default=default(False), action='store_true',
+                        help="Print number of changes and changed resources for each resource type and attribute path.")
+    parser.add_argument("--changelog-depth", dest="changelog_depth", type=int, default=default(None),
+                        help="Truncate attribute paths deeper than provided depth in changelog summary, e.g. tags.* for 1.")
+    parser.add_argument("--keep-change-log", dest="keep_change_log", default=default(False), action='store_true',
+                        help="Keep raw changelog of changed resources, e.g. to be written to snapshot.")
+    parser.add_argument("--openmetrics", dest="openmetrics_file", default=default(""),
+                        help="Write coverage and resource counts to the file in OpenMetrics text format.")
+    parser.add_argument("--snapshot", dest="snapshot_file", default=default(""),
+                        help="Write binary snapshot of combined results to the file, to be merged later with merge command.")
+    parser.add_argument("--approximate", dest="approximate", default=default(False), action='store_true',
+                        help="Estimate summary, and summary of each account and region with --detailed, in fixed memory "
+                             "using HyperLogLog sketches. --snapshot writes and merge reads sketch files instead.")
+
+
 def parse_arguments(_args):
     """
     Parse commandline arguments
@@ -406,22 +2143,50 @@ def parse_arguments(_args):
     """
     parser = argparse.ArgumentParser(description="Scan driftctl scan json output and combine results.")
     parser.add_argument("-i", "--input-dir", type=str, dest="root_dir",
-                        default=os.path.dirname(os.path.abspath(__file__)))
+                        default=os.path.dirname(os.path.abspath(__file__)),
+                        help="Directory or s3://bucket/prefix url to search driftctl scan output json files under.")
     parser.add_argument("-f", "--file-name", type=str, dest="file_name", default="driftctl-result.json")
-    parser.add_argument("--detailed", dest="detailed", default=False, action='store_true')
-    parser.add_argument("--output", "-o", dest="output_file", default="STDOUT")
-    parser.add_argument("--output-format", "-p", dest="output_format", choices=["TABLE", "CSV"], default="TABLE")
+    parser.add_argument("--s3-max-workers", type=int, dest="s3_max_workers", default=DEFAULT_S3_MAX_WORKERS,
+                        help="Number of driftctl scan output json files fetched in parallel from S3.")
+    _add_output_arguments(parser)
+    gate_group = parser.add_argument_group(
+        "CI gate", "Exit with non-zero exit code (3 coverage, 4 unmanaged, 5 missing, 6 changed) if any threshold is "
+                   "breached. Reading results stops as soon as a count threshold is exceeded.")
+    gate_group.add_argument("--fail-under-coverage", dest="fail_under_coverage", type=int, default=None,
+                            help="Fail if coverage percentage is below provided value.")
+    gate_group.add_argument("--max-unmanaged", dest="max_unmanaged", type=int, default=None,
+                            help="Fail if number of unmanaged resources exceeds provided value.")
+    gate_group.add_argument("--max-missing", dest="max_missing", type=int, default=None,
+                            help="Fail if number of missing resources exceeds provided value.")
+    gate_group.add_argument("--max-changed", dest="max_changed", type=int, default=None,
+                            help="Fail if number of changed resources exceeds provided value.")
+    gate_group.add_argument("--partial-report", dest="partial_report", default=False, action='store_true',
+                            help="Write report of results read so far, when reading stops early on threshold breach.")
+    subparsers = parser.add_subparsers(dest="command")
+    merge_parser = subparsers.add_parser("merge", help="Merge binary snapshots written with --snapshot and combine results.")
+    merge_parser.add_argument("snapshot_files", nargs="+", metavar="SNAPSHOT")
+    _add_output_arguments(merge_parser, suppress_defaults=True)
+    driftignore_parser = subparsers.add_parser(
+        "gen-driftignore", help="Generate .driftignore next to each driftctl scan output json file found.")
+    # Defaults are suppressed so that input arguments provided before sub command are not overridden.
+    driftignore_parser.add_argument("-i", "--input-dir", type=str, dest="root_dir", default=argparse.SUPPRESS)
+    driftignore_parser.add_argument("-f", "--file-name", type=str, dest="file_name", default=argparse.SUPPRESS)
+    driftignore_parser.add_argument("--exclude-unmanaged", dest="exclude_unmanaged", default=False, action='store_true')
+    driftignore_parser.add_argument("--exclude-missing", dest="exclude_missing", default=False, action='store_true')
+    driftignore_parser.add_argument("--exclude-changed", dest="exclude_changed", default=False, action='store_true')
+    driftignore_parser.add_argument("--max-workers", dest="max_workers", type=int, default=None)
     return parser.parse_args(_args)
 
 
 def find_files(root_dir, file_name):
     """
-    Find file_name from root_dir using glob
+    Find file_name from root_dir using glob, files are sorted so that results are combined in the same order
+    irrespective of directory traversal order.
     :param root_dir: root directory name from which to find the files.
     :param file_name: file name to searched from the root directory.
     :return: list of files
     """
-    return glob.glob(root_dir + os.sep + "**" + os.sep + file_name, recursive=True)
+    return sorted(glob.glob(root_dir + os.sep + "**" + os.sep + file_name, recursive=True))
 
 
 def get_terraform_output(dir_name: str):
@@ -460,45 +2225,435 @@ def get_account_details_from_terraform_output(dir_name: str):
     return str(resource_region), str(resource_account_id)
 
 
-def validate_and_load_driftctl_scan_json(files: List[str]):
+def iter_driftctl_scan_json(files, resolve_account_details: bool = True):
     """
 
-    Reads list of Driftctl scan output json files, converts it to dict, and add details of
-    source_file_name, resource_region and resource_account_id to each file, and return list of Driftctl scan output
+    Reads Driftctl scan output json files one at a time, converts it to dict, and add details of
+    source_file_name, resource_region and resource_account_id to each file, and generate Driftctl scan output
     json dict.
 
-    :param files: List of Driftctl scan output json files
-    :return: List of dict
+    :param files: iterable of Driftctl scan output json files
+    :param resolve_account_details: if False, terraform output is not used to get region and account id details,
+    and empty string is set for both.
+    :return: generator of dict
 
     """
-    drift_scan_dicts = []
     for in_file in files:
         try:
-            resource_region, resource_account_id = get_account_details_from_terraform_output(os.path.dirname(in_file))
+            resource_region, resource_account_id = get_account_details_from_terraform_output(os.path.dirname(in_file)) \
+                if resolve_account_details else ("", "")
             with open(in_file, "r", encoding="utf-8") as infile:
                 _my_dict = json.load(infile)
                 file_name = "." + in_file[len(os.getcwd()):] if in_file.find(os.getcwd()) == 0 else in_file
                 _my_dict["source_file_name"] = file_name
                 _my_dict["resource_region"] = resource_region
                 _my_dict["resource_account_id"] = resource_account_id
-                drift_scan_dicts.append(_my_dict)
                 infile.close()
         except Exception:
             print(f"Warning : Not able to read driftctl scan output json file {in_file}, "
                   f"data for this file will be ignored.", file=sys.stderr)
-    return drift_scan_dicts
+            continue
+        yield _my_dict
 
 
-if __name__ == '__main__':
-    args = parse_arguments(sys.argv[1:])
-    op_format: DriftctlOutputFormat = DriftctlOutputFormat.CSV if args.output_format == "CSV" \
-        else DriftctlOutputFormat.TABLE
-    print_driftctl_op(
-        output=get_driftctl_combined_output(
-            driftctl_output_json_dicts=validate_and_load_driftctl_scan_json(find_files(args.root_dir, args.file_name)),
-        ),
+def validate_and_load_driftctl_scan_json(files: List[str], resolve_account_details: bool = True):
+    """
+
+    Reads list of Driftctl scan output json files, converts it to dict, and add details of
+    source_file_name, resource_region and resource_account_id to each file, and return list of Driftctl scan output
+    json dict.
+
+    :param files: List of Driftctl scan output json files
+    :param resolve_account_details: if False, terraform output is not used to get region and account id details,
+    and empty string is set for both.
+    :return: List of dict
+
+    """
+    return list(iter_driftctl_scan_json(files, resolve_account_details))
+
+
+def parse_s3_url(url: str):
+    """
+    Parse s3://bucket/prefix url to bucket and prefix.
+    :param url: S3 url
+    :return: bucket(str), prefix(str)
+    """
+    bucket, _, prefix = url[len(S3_URL_SCHEME):].partition("/")
+    if not bucket:
+        raise ValueError(f"Invalid S3 url {url}, expected s3://bucket/prefix")
+    return bucket, prefix
+
+
+def get_s3_client(max_workers: int = DEFAULT_S3_MAX_WORKERS):
+    """
+    Get S3 client with connection pool large enough for max_workers parallel fetches. boto3 is only required
+    when reading Driftctl scan output json files from S3, endpoint of S3 compatible storage can be set with
+    AWS_ENDPOINT_URL environment variable.
+    :param max_workers: number of parallel fetches
+    :return: S3 client
+    """
+    # pylint: disable=import-outside-toplevel
+    import boto3  # type: ignore
+    from botocore.config import Config  # type: ignore
+    return boto3.session.Session().client("s3", config=Config(max_pool_connections=max_workers))
+
+
+def find_s3_objects(client, bucket: str, prefix: str, file_name: str):
+    """
+    Find keys of objects named file_name under prefix of S3 bucket, listing all pages of objects.
+    :param client: S3 client
+    :param bucket: S3 bucket name
+    :param prefix: key prefix to search objects under.
+    :param file_name: object name to search for, last element of the key.
+    :return: sorted list of keys
+    """
+    keys = []
+    for page in client.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+        for s3_object in page.get("Contents", []):
+            if s3_object["Key"].rsplit("/", 1)[-1] == file_name:
+                keys.append(s3_object["Key"])
+    return sorted(keys)
+
+
+def get_account_details_from_s3_key(key: str):
+    """
+    Get region and account id details from elements of S3 object key, e.g. scans/111111111111/us-east-1/..., the
+    first element matching is used for each, if details are not found for either, empty string is returned.
+    :param key: object key
+    :return: resource_region(str), resource_account_id (str)
+    """
+    resource_region = ""
+    resource_account_id = ""
+    for element in key.split("/")[:-1]:
+        if not resource_region and AWS_REGION_PATTERN.match(element):
+            resource_region = element
+        elif not resource_account_id and AWS_ACCOUNT_ID_PATTERN.match(element):
+            resource_account_id = element
+    return resource_region, resource_account_id
+
+
+def _get_s3_terraform_output(client, bucket: str, key: str):
+    """
+    Fetch terraform output json object stored next to Driftctl scan output json object.
+    :param client: S3 client
+    :param bucket: S3 bucket name
+    :param key: Driftctl scan output json object key
+    :return: dict, empty if object is not found or can not be read.
+    """
+    tf_output_key = key.rsplit("/", 1)[0] + "/" + S3_TERRAFORM_OUTPUT_FILE_NAME if "/" in key \
+        else S3_TERRAFORM_OUTPUT_FILE_NAME
+    try:
+        body = client.get_object(Bucket=bucket, Key=tf_output_key)["Body"]
+        try:
+            return json.load(body)
+        finally:
+            body.close()
+    except client.exceptions.NoSuchKey:
+        return {}
+    except Exception:
+        print(f"WARN : Not able to get details from terraform output {S3_URL_SCHEME}{bucket}/{tf_output_key}",
+              file=sys.stderr)
+        return {}
+
+
+def _get_s3_driftctl_scan_json(client, bucket: str, key: str):
+    """
+    Fetch Driftctl scan output json object from S3 and parse object body. Region and account id details are read
+    from terraform output json object stored next to it (see S3_TERRAFORM_OUTPUT_FILE_NAME), else from elements of
+    object key, else from resource-region and resource-account-id object metadata.
+    :param client: S3 client
+    :param bucket: S3 bucket name
+    :param key: object key
+    :return: dict, None if object can not be read.
+    """
+    source_file_name = f"{S3_URL_SCHEME}{bucket}/{key}"
+    try:
+        response = client.get_object(Bucket=bucket, Key=key)
+        body = response["Body"]
+        try:
+            _my_dict = json.load(body)
+        finally:
+            body.close()
+    except Exception:
+        print(f"Warning : Not able to read driftctl scan output json file {source_file_name}, "
+              f"data for this file will be ignored.", file=sys.stderr)
+        return None
+    tf_output = _get_s3_terraform_output(client, bucket, key)
+    key_region, key_account_id = get_account_details_from_s3_key(key)
+    metadata = response.get("Metadata", {})
+    _my_dict["source_file_name"] = source_file_name
+    _my_dict["resource_region"] = str(tf_output.get("resource_region", {}).get("value", "") or key_region or
+                                      metadata.get("resource-region", ""))
+    _my_dict["resource_account_id"] = str(tf_output.get("resource_account_id", {}).get("value", "") or
+                                          key_account_id or metadata.get("resource-account-id", ""))
+    if not _my_dict["resource_region"] or not _my_dict["resource_account_id"]:
+        print(f"WARN : Not able to get region and account id details for {source_file_name}", file=sys.stderr)
+    return _my_dict
+
+
+def iter_s3_driftctl_scan_json(url: str, file_name: str, max_workers: int = DEFAULT_S3_MAX_WORKERS, client=None):
+    """
+
+    Reads Driftctl scan output json files from S3 bucket, fetching up to max_workers objects in parallel over a
+    pooled set of connections, and generate Driftctl scan output json dict in the order of object keys. At most
+    2 * max_workers objects are fetched ahead of the consumer.
+
+    :param url: s3://bucket/prefix url to search Driftctl scan output json files under.
+    :param file_name: Driftctl scan output json file name to search for.
+    :param max_workers: number of parallel fetches.
+    :param client: S3 client, created with get_s3_client if None.
+    :return: generator of dict
+    """
+    bucket, prefix = parse_s3_url(url)
+    if client is None:
+        client = get_s3_client(max_workers)
+    keys = find_s3_objects(client, bucket, prefix, file_name)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending: deque = deque()
+        for key in keys:
+            pending.append(executor.submit(_get_s3_driftctl_scan_json, client, bucket, key))
+            if len(pending) >= 2 * max_workers:
+                _my_dict = pending.popleft().result()
+                if _my_dict is not None:
+                    yield _my_dict
+        while pending:
+            _my_dict = pending.popleft().result()
+            if _my_dict is not None:
+                yield _my_dict
+
+
+def iter_input_driftctl_scan_json(root_dir: str, file_name: str, resolve_account_details: bool = True,
+                                  s3_max_workers: int = DEFAULT_S3_MAX_WORKERS):
+    """
+    Generate Driftctl scan output json dict for all files named file_name, under root_dir, which is either a local
+    directory or s3://bucket/prefix url.
+    :param root_dir: root directory or S3 url from which to find Driftctl scan output json files.
+    :param file_name: Driftctl scan output json file name to search for.
+    :param resolve_account_details: if False, terraform output is not used to get region and account id details
+    for local files.
+    :param s3_max_workers: number of parallel fetches for S3 url.
+    :return: generator of dict
+    """
+    if root_dir.startswith(S3_URL_SCHEME):
+        return iter_s3_driftctl_scan_json(root_dir, file_name, s3_max_workers)
+    return iter_driftctl_scan_json(find_files(root_dir, file_name), resolve_account_details)
+
+
+def iter_resources(root_dir: str, filters: Optional[DriftctlResourceFilter] = None,
+                   file_name: str = "driftctl-result.json", resolve_account_details: bool = True):
+    """
+
+    Library entry point, generate resources from all Driftctl scan output json files found under root_dir. Files are
+    read lazily, one at a time, so callers can stop iterating early without reading remaining files. Resources are not
+    merged, use aggregate to get combined output.
+
+    :param root_dir: root directory name or s3://bucket/prefix url from which to find Driftctl scan output json files.
+    :param filters: DriftctlResourceFilter, only resources matching filter are generated.
+    :param file_name: Driftctl scan output json file name to search for.
+    :param resolve_account_details: if False, terraform output is not used to get region and account id details.
+    :return: generator of DriftctlResourceRecord
+    """
+    yield from iter_driftctl_resources(
+        iter_input_driftctl_scan_json(root_dir, file_name, resolve_account_details), filters=filters)
+
+
+def aggregate(root_dir: str, filters: Optional[DriftctlResourceFilter] = None, file_name: str = "driftctl-result.json",
+              resolve_account_details: bool = True, managed_details: bool = False):
+    """
+
+    Library entry point, combine all Driftctl scan output json files found under root_dir, reading one file at a time.
+
+    :param root_dir: root directory name or s3://bucket/prefix url from which to find Driftctl scan output json files.
+    :param filters: DriftctlResourceFilter, only resources matching filter are combined.
+    :param file_name: Driftctl scan output json file name to search for.
+    :param resolve_account_details: if False, terraform output is not used to get region and account id details.
+    :param managed_details: if True, details of managed resources are cached, else managed resources are only counted.
+    :return: DriftctlOutput
+    """
+    return get_driftctl_combined_output(
+        iter_input_driftctl_scan_json(root_dir, file_name, resolve_account_details),
+        managed_details=managed_details, filters=filters)
+
+
+def escape_driftignore_id(resource_id: str):
+    """
+    Escape resource id for .driftignore, driftctl uses dot as separator between resource type and id,
+    so dots in resource ids are escaped with backslash, same as driftctl gen-driftignore.
+    :param resource_id: resource id
+    :return: str
+    """
+    return resource_id.replace(".", "\\.")
+
+
+def get_driftignore_content(output: DriftctlOutput, include_unmanaged: bool = True, include_missing: bool = True,
+                            include_changed: bool = True):
+    """
+
+    Get .driftignore file content ignoring resources cached on Driftctl output, resources are sorted within
+    each category so that content does not depend on order of resources in driftctl scan output.
+
+    :param output: Driftctl output object.
+    :param include_unmanaged: if True, unmanaged resources are ignored.
+    :param include_missing: if True, missing resources are ignored.
+    :param include_changed: if True, changed resources are ignored.
+    :return: str
+    """
+    lines = []
+    for include, comment, resources in ((include_unmanaged, "# Resources not covered by IaC", output.unmanaged),
+                                        (include_missing, "# Missing resources", output.missing),
+                                        (include_changed, "# Changed resources", output.differences)):
+        if include and resources:
+            lines.append(comment)
+            lines.extend(sorted(f"{resource.type}.{escape_driftignore_id(resource.id)}"
+                                for resource in resources.values()))
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def write_file_if_changed(file_name: str, content: str):
+    """
+    Write content to file, unless file already exists with the same content.
+    :param file_name: file name to write
+    :param content: file content
+    :return: True if file was written, else False
+    """
+    try:
+        with open(file_name, "r", encoding="utf-8") as existing_file:
+            if existing_file.read() == content:
+                return False
+    except OSError:
+        pass
+    with open(file_name, "w", encoding="utf-8") as out_file:
+        out_file.write(content)
+    return True
+
+
+def generate_driftignore_files(driftctl_output_json_dicts=None, include_unmanaged: bool = True,
+                               include_missing: bool = True, include_changed: bool = True,
+                               max_workers: Optional[int] = None):
+    """
+
+    Generate .driftignore next to each Driftctl scan output json file, using already loaded Driftctl scan output json
+    dict(s). Files are written in parallel, and files with unchanged content are not rewritten.
+
+    :param driftctl_output_json_dicts: List of Drifctl scan output json dict, as returned by
+    validate_and_load_driftctl_scan_json.
+    :param include_unmanaged: if True, unmanaged resources are ignored.
+    :param include_missing: if True, missing resources are ignored.
+    :param include_changed: if True, changed resources are ignored.
+    :param max_workers: maximum number of parallel file writes, defaults to ThreadPoolExecutor default.
+    :return: List of .driftignore file names written.
+    """
+    if driftctl_output_json_dicts is None:
+        driftctl_output_json_dicts = []
+
+    def generate(drift_output):
+        file_name = os.path.join(os.path.dirname(drift_output.get('source_file_name')), ".driftignore")
+        content = get_driftignore_content(get_driftctl_combined_output([drift_output]), include_unmanaged,
+                                          include_missing, include_changed)
+        return file_name if write_file_if_changed(file_name, content) else None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return [file_name for file_name in executor.map(generate, driftctl_output_json_dicts) if file_name]
+
+
+def report_gate_breaches(breaches):
+    """
+    Print CI gate threshold breaches and get exit code of the first breach.
+    :param breaches: List of (DriftctlExitCode, message) as returned by DriftctlGate.check
+    :return: int exit code
+    """
+    for _, message in breaches:
+        print(f"Error: CI gate failed, {message}", file=sys.stderr)
+    return breaches[0][0].value if breaches else DriftctlExitCode.OK.value
+
+
+def run_approximate(args, gate: DriftctlGate, op_format: DriftctlOutputFormat):
+    """
+    Estimate summary of driftctl scan output json files or sketch files as per commandline arguments and print results.
+    :param args: parsed commandline arguments
+    :param gate: DriftctlGate, thresholds are checked against approximate summary.
+    :param op_format: DriftctlOutputFormat
+    :return: int exit code
+    """
+    if args.openmetrics_file or args.changelog_summary:
+        print("Warn: --openmetrics and --changelog-summary are not supported with --approximate, and are ignored",
+              file=sys.stderr)
+    if args.command == "merge":
+        output = merge_driftctl_sketches(args.snapshot_files)
+    else:
+        output = get_driftctl_approximate_output(
+            iter_input_driftctl_scan_json(args.root_dir, args.file_name, s3_max_workers=args.s3_max_workers))
+    if args.snapshot_file:
+        dump_driftctl_sketches(output, args.snapshot_file)
+    print_approximate_driftctl_op(
+        output=output,
         print_details=args.detailed,
         output_file_format=op_format,
         output_file_mode=DriftctlOutputMode.STDOUT if args.output_file == "STDOUT" else DriftctlOutputMode.FILE,
         output_file_name=args.output_file
     )
+    return report_gate_breaches(gate.check(output)) if gate.is_enabled() else DriftctlExitCode.OK.value
+
+
+def main(_args):
+    """
+    Combine driftctl scan output json files or snapshots as per commandline arguments and print results.
+    :param _args: commandline arguments
+    :return: int exit code
+    """
+    args = parse_arguments(_args)
+    op_format = DriftctlOutputFormat[args.output_format]
+    if args.command == "gen-driftignore":
+        if args.root_dir.startswith(S3_URL_SCHEME):
+            print("Error: .driftignore can only be generated for driftctl scan output json files on local disk",
+                  file=sys.stderr)
+            sys.exit(2)
+        for file_name in generate_driftignore_files(
+                validate_and_load_driftctl_scan_json(find_files(args.root_dir, args.file_name), resolve_account_details=False),
+                include_unmanaged=not args.exclude_unmanaged, include_missing=not args.exclude_missing,
+                include_changed=not args.exclude_changed, max_workers=args.max_workers):
+            print(f"Generated {file_name}")
+        return DriftctlExitCode.OK.value
+    gate = DriftctlGate(fail_under_coverage=args.fail_under_coverage, max_unmanaged=args.max_unmanaged,
+                        max_missing=args.max_missing, max_changed=args.max_changed)
+    if args.approximate:
+        return run_approximate(args, gate, op_format)
+    if args.command == "merge":
+        output = merge_driftctl_snapshots(args.snapshot_files, keep_change_log=args.keep_change_log,
+                                          changelog_depth=args.changelog_depth)
+    else:
+        output = get_driftctl_combined_output(
+            driftctl_output_json_dicts=iter_input_driftctl_scan_json(args.root_dir, args.file_name,
+                                                                     s3_max_workers=args.s3_max_workers),
+            keep_change_log=args.keep_change_log,
+            changelog_depth=args.changelog_depth,
+            stop_condition=gate.is_decided if gate.is_enabled() else None
+        )
+    # Coverage of partial results is understated, so only count thresholds are checked against these.
+    breaches = gate.get_count_breaches(output) if output.truncated else gate.check(output)
+    if output.truncated:
+        print("Warn: Stopped reading driftctl scan output as threshold is exceeded, results are partial",
+              file=sys.stderr)
+        if not args.partial_report:
+            return report_gate_breaches(breaches)
+        if args.snapshot_file or args.openmetrics_file:
+            print("Warn: Snapshot and openmetrics files are not written for partial results", file=sys.stderr)
+    if args.snapshot_file and not output.truncated:
+        dump_driftctl_snapshot(output, args.snapshot_file)
+    if args.openmetrics_file and not output.truncated:
+        write_openmetrics(output, args.openmetrics_file)
+    print_driftctl_op(
+        output=output,
+        print_details=args.detailed,
+        output_file_format=op_format,
+        output_file_mode=DriftctlOutputMode.STDOUT if args.output_file == "STDOUT" else DriftctlOutputMode.FILE,
+        output_file_name=args.output_file,
+        sort_by=args.sort_by,
+        sort_max_rows_in_memory=args.sort_max_rows_in_memory,
+        print_changelog=args.changelog_summary
+    )
+    return report_gate_breaches(breaches)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,14 +1,29 @@
 """
 Test cases for Driftctl result python script that merges drifctl output data from multiple folders and combines results
 """
+# pylint: disable=too-many-lines
 import unittest
 import sys
+import io
+import contextlib
+import json
 import os
+import random
 import tempfile
+import shutil
+# Disabling bandit B404 check on below line as subprocess only runs node on scripts written by the tests.
+import subprocess  # nosec B404
+import importlib.util
 
 from driftctl_result import DriftctlSummary, get_driftctl_resource, DriftctlResourceMin, DriftctlOutput, \
     get_terraform_output, find_files, get_driftctl_combined_output, validate_and_load_driftctl_scan_json, \
-    print_data_table, print_data_csv, print_driftctl_op, DriftctlOutputMode, DriftctlOutputFormat
+    print_data_table, print_data_csv, print_driftctl_op, DriftctlOutputMode, DriftctlOutputFormat, \
+    dump_driftctl_snapshot, load_driftctl_snapshot, merge_driftctl_snapshots, parse_arguments, \
+    get_resource_key, sort_detail_rows, generate_driftignore_files, get_driftignore_content, iter_resources, \
+    aggregate, DriftctlResourceFilter, DriftctlResourceType, DriftctlResourceRecord, DriftctlChangelogIndex, \
+    write_openmetrics, get_drift_metrics, iter_driftctl_resources, iter_s3_driftctl_scan_json, parse_s3_url, \
+    DriftctlGate, DriftctlExitCode, main, HTML_REPORT_WRITE_BATCH_ROWS, DriftctlSketch, \
+    get_driftctl_approximate_output, dump_driftctl_sketches, merge_driftctl_sketches, print_html_detail_view, DETAIL_HEADERS
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)) + os.sep + ".." + os.sep)
 
@@ -441,3 +456,938 @@ class TestDriftctlResult(unittest.TestCase):
             data_op = data_file_op.read()
             os.unlink(op_file_name_csv)
             self.assertEqual(data_op, expected_op_csvd)
+
+    def test_driftctl_snapshot(self):
+        """
+        Test binary snapshot of driftctl output is written and read back without losing details.
+        :return:
+        """
+        test_driftctl_json_folder = os.path.dirname(os.path.abspath(__file__)) + os.sep + "test_json"
+        test_output = get_driftctl_combined_output(
+            driftctl_output_json_dicts=validate_and_load_driftctl_scan_json(
+                [test_driftctl_json_folder + os.sep + "1" + os.sep + "test-driftctl-result.json"])
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            snapshot_file = temp_dir + os.sep + "1.snap"
+            dump_driftctl_snapshot(test_output, snapshot_file)
+            snapshot_output = load_driftctl_snapshot(snapshot_file)
+        self.assertEqual(snapshot_output, test_output)
+        self.assertEqual(snapshot_output.get_summary(), test_output.get_summary())
+        changed = list(snapshot_output.differences.values())[0]
+        self.assertEqual(changed.change_log, list(test_output.differences.values())[0].change_log)
+        self.assertEqual(changed.source, list(test_output.differences.values())[0].source)
+
+    def test_merge_driftctl_snapshots(self):
+        """
+        Test merging snapshots produces the same output as combining driftctl scan output json files.
+        :return:
+        """
+        test_driftctl_json_folder = os.path.dirname(os.path.abspath(__file__)) + os.sep + "test_json"
+        file_list = [
+            test_driftctl_json_folder + os.sep + "1" + os.sep + "test-driftctl-result.json",
+            test_driftctl_json_folder + os.sep + "2" + os.sep + "test-driftctl-result.json"
+        ]
+        drift_scan_dicts = validate_and_load_driftctl_scan_json(file_list, resolve_account_details=False)
+        # Global resources are combined from both files for different accounts, and from first file for same account.
+        for account_ids, separators in ((("111111111110", "111111111111"), 1), (("111111111111", "111111111111"), 0)):
+            for drift_scan_dict, account_id in zip(drift_scan_dicts, account_ids):
+                drift_scan_dict["resource_account_id"] = account_id
+            expected_output = get_driftctl_combined_output(driftctl_output_json_dicts=drift_scan_dicts)
+            with tempfile.TemporaryDirectory() as temp_dir:
+                snapshot_files = []
+                for index, drift_scan_dict in enumerate(drift_scan_dicts):
+                    snapshot_file = temp_dir + os.sep + f"{index}.snap"
+                    dump_driftctl_snapshot(get_driftctl_combined_output(driftctl_output_json_dicts=[drift_scan_dict]),
+                                           snapshot_file)
+                    snapshot_files.append(snapshot_file)
+                invalid_file = temp_dir + os.sep + "invalid.snap"
+                with open(invalid_file, "wb") as snapshot_file:
+                    snapshot_file.write(b"not a snapshot")
+                snapshot_files.append(invalid_file)
+                snapshot_files.append(temp_dir + os.sep + "does-not-exist.snap")
+                merged_output = merge_driftctl_snapshots(snapshot_files)
+            self.assertEqual(merged_output, expected_output)
+            self.assertEqual(merged_output.get_summary().get_total_resources_count(), 6)
+            self.assertEqual([unmanaged.source for unmanaged in merged_output.unmanaged.values()],
+                             [unmanaged.source for unmanaged in expected_output.unmanaged.values()])
+            self.assertTrue(all(unmanaged.source.count(", ") == separators
+                                for unmanaged in merged_output.unmanaged.values()))
+
+    def test_parse_arguments_merge(self):
+        """
+        Test merge command line arguments are parsed, while default command continues to work without sub command.
+        :return:
+        """
+        args = parse_arguments(["merge", "a.snap", "b.snap", "--snapshot", "c.snap", "-p", "CSV"])
+        self.assertEqual(args.command, "merge")
+        self.assertEqual(args.snapshot_files, ["a.snap", "b.snap"])
+        self.assertEqual(args.snapshot_file, "c.snap")
+        self.assertEqual(args.output_format, "CSV")
+        args = parse_arguments(["--detailed"])
+        self.assertIsNone(args.command)
+        self.assertTrue(args.detailed)
+        # Output arguments provided before merge are not overridden by defaults of merge command.
+        args = parse_arguments(["--detailed", "-p", "CSV", "--sort-by", "id", "--approximate", "merge", "a.sketch",
+                                "-o", "report.csv"])
+        self.assertEqual((args.detailed, args.output_format, args.sort_by, args.approximate, args.output_file),
+                         (True, "CSV", ["id"], True, "report.csv"))
+        args = parse_arguments(["merge", "a.snap"])
+        self.assertEqual((args.detailed, args.output_format, args.sort_by, args.approximate, args.output_file),
+                         (False, "TABLE", [], False, "STDOUT"))
+
+    def test_driftctl_output_managed_details(self):
+        """
+        Test managed resources are only counted by default, and details are cached only when requested.
+        :return:
+        """
+        test_driftctl_json_folder = os.path.dirname(os.path.abspath(__file__)) + os.sep + "test_json"
+        file_list = [
+            test_driftctl_json_folder + os.sep + "1" + os.sep + "test-driftctl-result.json",
+            test_driftctl_json_folder + os.sep + "2" + os.sep + "test-driftctl-result.json"
+        ]
+        test_output = get_driftctl_combined_output(
+            driftctl_output_json_dicts=validate_and_load_driftctl_scan_json(file_list))
+        detailed_output = get_driftctl_combined_output(
+            driftctl_output_json_dicts=validate_and_load_driftctl_scan_json(file_list), managed_details=True)
+        self.assertEqual(test_output.get_summary(), detailed_output.get_summary())
+        self.assertIn(get_resource_key("i-09039f97729659bd6", "aws_instance"), test_output.managed)
+        self.assertTrue(all(isinstance(managed, DriftctlResourceMin) for managed in detailed_output.managed.values()))
+        with self.assertRaises(ValueError):
+            detailed_output.add_managed_resource_key(get_resource_key("test-id", "test-type"))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            snapshot_file = temp_dir + os.sep + "detailed.snap"
+            dump_driftctl_snapshot(detailed_output, snapshot_file)
+            self.assertEqual(load_driftctl_snapshot(snapshot_file, DriftctlOutput(managed_details=True)), detailed_output)
+            # Managed details from snapshot are reduced to keys when loaded into output counting managed resources.
+            self.assertEqual(load_driftctl_snapshot(snapshot_file), test_output)
+
+    def test_sort_detail_rows(self):
+        """
+        Test detail rows are sorted in memory and with sorted runs spilled to temporary files, with the same result.
+        :return:
+        """
+        rows = [
+            ["Unmanaged", "id-3", "aws_iam_policy", "", "", "b.json"],
+            ["Missing", "id-2", "aws_instance", "us-east-1", "111111111111", "a.json"],
+            ["Unmanaged", "id-1", "aws_iam_policy", None, None, "a.json"],
+            ["Changed", "id-4", "aws_instance", "eu-west-1", "222222222222", "c.json"],
+            ["Unmanaged", "id-0", "aws_s3_bucket", "us-east-1", "111111111111", "a.json"],
+        ]
+        expected_rows = [
+            ["Changed", "id-4", "aws_instance", "eu-west-1", "222222222222", "c.json"],
+            ["Missing", "id-2", "aws_instance", "us-east-1", "111111111111", "a.json"],
+            ["Unmanaged", "id-1", "aws_iam_policy", None, None, "a.json"],
+            ["Unmanaged", "id-3", "aws_iam_policy", "", "", "b.json"],
+            ["Unmanaged", "id-0", "aws_s3_bucket", "us-east-1", "111111111111", "a.json"],
+        ]
+        sort_by = ["category", "type", "id"]
+        self.assertEqual(list(sort_detail_rows(iter(rows), sort_by)), expected_rows)
+        for max_rows_in_memory in (1, 2, 3):
+            self.assertEqual(list(sort_detail_rows(iter(rows), sort_by, max_rows_in_memory)), expected_rows)
+        # Sort is stable, rows with same sort columns keep their order.
+        self.assertEqual([row[1] for row in sort_detail_rows(iter(rows), ["account"], 2)],
+                         ["id-3", "id-1", "id-2", "id-0", "id-4"])
+        self.assertEqual(list(sort_detail_rows(iter([]), sort_by, 1)), [])
+
+    def test_print_driftctl_op_sorted(self):
+        """
+        Test sorted detail view is the same irrespective of order in which resources were added.
+        :return:
+        """
+        driftctl_op_test_objects = get_driftctl_op_test_objects()
+        unmanaged_resources = [
+            driftctl_op_test_objects.get('umr'),
+            DriftctlResourceMin(source="test-unmanaged-source", account_id="test-unmanaged-account-id",
+                                region="test-unmanaged-region", type="test-unmanaged-type", id="test-unmanaged-id-0")
+        ]
+        data = []
+        op_file_name_csv = "test_op_sorted.csv"
+        for resources in (unmanaged_resources, unmanaged_resources[::-1]):
+            driftctl_op = DriftctlOutput()
+            driftctl_op.add_changed_resource(resource=driftctl_op_test_objects.get('cr'))
+            for resource in resources:
+                driftctl_op.add_unmanaged_resource(resource=resource)
+            print_driftctl_op(output=driftctl_op, output_file_mode=DriftctlOutputMode.FILE,
+                              output_file_name=op_file_name_csv, print_details=True,
+                              output_file_format=DriftctlOutputFormat.CSV, sort_by=["type", "id"],
+                              sort_max_rows_in_memory=1)
+            with open(op_file_name_csv, "r", encoding="utf-8") as data_file_op:
+                data.append(data_file_op.read())
+            os.unlink(op_file_name_csv)
+        self.assertEqual(data[0], data[1])
+        self.assertTrue(data[0].endswith("Category,Resource Id,Resource Type,Region,Account Id,Source\n"
+                                         "Changed,test-changed-id,test-changed-type,test-region,"
+                                         "test-changed-account-id,test-changed-source\n"
+                                         "Unmanaged,test-unmanaged-id,test-unmanaged-type,test-unmanaged-region,"
+                                         "test-unmanaged-account-id,test-unmanaged-source\n"
+                                         "Unmanaged,test-unmanaged-id-0,test-unmanaged-type,test-unmanaged-region,"
+                                         "test-unmanaged-account-id,test-unmanaged-source\n"))
+
+    def test_generate_driftignore_files(self):
+        """
+        Test .driftignore is generated next to each driftctl scan output json file, and unchanged files are not rewritten.
+        :return:
+        """
+        test_driftctl_json_folder = os.path.dirname(os.path.abspath(__file__)) + os.sep + "test_json"
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for folder in ("1", "2"):
+                shutil.copytree(test_driftctl_json_folder + os.sep + folder, temp_dir + os.sep + folder)
+            drift_scan_dicts = validate_and_load_driftctl_scan_json(find_files(temp_dir, "test-driftctl-result.json"),
+                                                                    resolve_account_details=False)
+            written_files = generate_driftignore_files(drift_scan_dicts)
+            self.assertEqual(sorted(written_files), [temp_dir + os.sep + "1" + os.sep + ".driftignore",
+                                                     temp_dir + os.sep + "2" + os.sep + ".driftignore"])
+            with open(temp_dir + os.sep + "1" + os.sep + ".driftignore", "r", encoding="utf-8") as driftignore_file:
+                self.assertEqual(driftignore_file.read(), "# Resources not covered by IaC\n"
+                                                          "aws_iam_access_key.test-id\n"
+                                                          "aws_iam_policy.arn:aws:iam::111111111111:policy/"
+                                                          "AwsSecurityNacundaXXXXXXXX\n"
+                                                          "# Changed resources\n"
+                                                          "aws_instance.i-09039f97729659bd6\n")
+            self.assertEqual(generate_driftignore_files(drift_scan_dicts, max_workers=1), [])
+            self.assertEqual(len(generate_driftignore_files(drift_scan_dicts, include_changed=False)), 2)
+            with open(temp_dir + os.sep + "1" + os.sep + ".driftignore", "r", encoding="utf-8") as driftignore_file:
+                self.assertNotIn("# Changed resources", driftignore_file.read())
+
+    def test_get_driftignore_content(self):
+        """
+        Test .driftignore content escapes dots in resource id, and is empty if there are no resources to ignore.
+        :return:
+        """
+        driftctl_op = DriftctlOutput()
+        self.assertEqual(get_driftignore_content(driftctl_op), "")
+        driftctl_op.add_missing_resource(DriftctlResourceMin(id="my.bucket", type="aws_s3_bucket", source="a"))
+        driftctl_op.add_managed_resource(DriftctlResourceMin(id="managed", type="aws_s3_bucket", source="a"))
+        self.assertEqual(get_driftignore_content(driftctl_op), "# Missing resources\naws_s3_bucket.my\\.bucket\n")
+        self.assertEqual(get_driftignore_content(driftctl_op, include_missing=False), "")
+        args = parse_arguments(["-i", "terraform", "gen-driftignore", "--exclude-missing"])
+        self.assertEqual((args.command, args.root_dir, args.exclude_missing), ("gen-driftignore", "terraform", True))
+        args = parse_arguments(["gen-driftignore", "-i", "terraform"])
+        self.assertEqual((args.root_dir, args.file_name), ("terraform", "driftctl-result.json"))
+
+
+class TestDriftctlResultLibrary(unittest.TestCase):
+    """
+    Test cases for Driftctl Result streaming library API
+    """
+
+    def test_iter_resources(self):
+        """
+        Test resources are generated lazily from driftctl scan output json files, and filters are applied.
+        :return:
+        """
+        test_driftctl_json_folder = os.path.dirname(os.path.abspath(__file__)) + os.sep + "test_json"
+        records = list(iter_resources(test_driftctl_json_folder, file_name="test-driftctl-result.json",
+                                      resolve_account_details=False))
+        self.assertTrue(all(isinstance(record, DriftctlResourceRecord) for record in records))
+        # Resources are not merged, unmanaged policies common in files 1 and 2 are generated twice, 71 from file 3.
+        self.assertEqual(len([record for record in records
+                              if record.resource_type == DriftctlResourceType.UNMANAGED]), 75)
+        first_record = next(iter_resources(test_driftctl_json_folder, file_name="test-driftctl-result.json",
+                                           resolve_account_details=False))
+        self.assertEqual(first_record.resource_type, DriftctlResourceType.UNMANAGED)
+        filters = DriftctlResourceFilter(categories=[DriftctlResourceType.DIFF], types=["aws_instance"])
+        records = list(iter_resources(test_driftctl_json_folder, filters=filters, file_name="test-driftctl-result.json",
+                                      resolve_account_details=False))
+        self.assertTrue(records)
+        self.assertTrue(all(record.resource_type == DriftctlResourceType.DIFF and record.resource.type == "aws_instance"
+                            and record.resource.change_log for record in records))
+        self.assertEqual(list(iter_resources(test_driftctl_json_folder, filters=DriftctlResourceFilter(regions=["x"]),
+                                             file_name="test-driftctl-result.json", resolve_account_details=False)), [])
+
+    def test_aggregate(self):
+        """
+        Test aggregate combines driftctl scan output json files found under root directory.
+        :return:
+        """
+        test_driftctl_json_folder = os.path.dirname(os.path.abspath(__file__)) + os.sep + "test_json"
+        expected_output = get_driftctl_combined_output(validate_and_load_driftctl_scan_json(
+            find_files(test_driftctl_json_folder, "test-driftctl-result.json")))
+        self.assertEqual(aggregate(test_driftctl_json_folder, file_name="test-driftctl-result.json"), expected_output)
+        filtered_output = aggregate(test_driftctl_json_folder, file_name="test-driftctl-result.json",
+                                    filters=DriftctlResourceFilter(categories=[DriftctlResourceType.MANAGED]))
+        self.assertEqual(filtered_output.get_summary(), DriftctlSummary(total_managed=len(expected_output.managed)))
+        # Filtered output uses the same global resource and count only managed resource handling.
+        self.assertTrue(all(isinstance(labels, tuple) for labels in filtered_output.managed.values()))
+        types = ["aws_iam_policy", "aws_instance"]
+        filtered_output = aggregate(test_driftctl_json_folder, file_name="test-driftctl-result.json",
+                                    filters=DriftctlResourceFilter(types=types))
+        expected_summary = DriftctlSummary(
+            total_managed=len([labels for labels in expected_output.managed.values() if labels[2] in types]),
+            total_unmanaged=len([resource for resource in expected_output.unmanaged.values() if resource.type in types]),
+            total_changed=len([resource for resource in expected_output.differences.values() if resource.type in types]))
+        self.assertEqual(filtered_output.get_summary(), expected_summary)
+        self.assertEqual([resource.source for resource in filtered_output.unmanaged.values()],
+                         [resource.source for resource in expected_output.unmanaged.values()
+                          if resource.type in types])
+
+
+class TestDriftctlChangelogIndex(unittest.TestCase):
+    """
+    Test cases for Driftctl Result changelog index
+    """
+
+    def get_test_drift_scan_dicts(self):
+        """
+        Load driftctl scan output json test files 1, 2 and 3 without terraform output details.
+        :return: List of dict
+        """
+        test_driftctl_json_folder = os.path.dirname(os.path.abspath(__file__)) + os.sep + "test_json"
+        return validate_and_load_driftctl_scan_json(
+            [test_driftctl_json_folder + os.sep + folder + os.sep + "test-driftctl-result.json" for folder in "123"],
+            resolve_account_details=False)
+
+    def test_changelog_index(self):
+        """
+        Test changelog index counts changes and changed resources for each attribute path, without mutating input.
+        :return:
+        """
+        drift_scan_dicts = self.get_test_drift_scan_dicts()
+        test_output = get_driftctl_combined_output(drift_scan_dicts, keep_change_log=False)
+        self.assertTrue(all("change_log" not in difference.get('res') for drift_scan_dict in drift_scan_dicts
+                            for difference in drift_scan_dict.get('differences')))
+        self.assertTrue(all(diff.change_log is None for diff in test_output.differences.values()))
+        rows = test_output.changelog_index.get_rows()
+        self.assertEqual(rows[0], ["aws_instance", "iam_instance_profile", 3, 3])
+        self.assertIn(["aws_instance", "security_groups.*", 1, 1], rows)
+        self.assertIn(["aws_instance", "tags.DummyTag", 1, 1], rows)
+        test_output = get_driftctl_combined_output(drift_scan_dicts, changelog_depth=1)
+        self.assertEqual(test_output.changelog_index.get_rows()[0], ["aws_instance", "tags.*", 4, 3])
+        self.assertTrue(all(diff.change_log for diff in test_output.differences.values()))
+
+    def test_changelog_index_accounts(self):
+        """
+        Test the same resource id drifting in different accounts is counted as different affected resources, also
+        when merged from snapshots.
+        :return:
+        """
+        drift_scan_dicts = [
+            {"source_file_name": f"./{account_id}/r.json", "resource_region": "us-east-1",
+             "resource_account_id": account_id,
+             "differences": [{"res": {"id": "OrgRole", "type": "aws_iam_role"},
+                              "changelog": [{"type": "update", "path": ["assume_role_policy"]}]}]}
+            for account_id in ("111", "222")]
+        test_output = get_driftctl_combined_output(drift_scan_dicts)
+        self.assertEqual(test_output.changelog_index.get_rows(), [["aws_iam_role", "assume_role_policy", 2, 2]])
+        with tempfile.TemporaryDirectory() as temp_dir:
+            snapshot_files = []
+            for index, drift_scan_dict in enumerate(drift_scan_dicts + drift_scan_dicts[:1]):
+                snapshot_files.append(temp_dir + os.sep + f"{index}.snap")
+                dump_driftctl_snapshot(get_driftctl_combined_output([drift_scan_dict]), snapshot_files[-1])
+            merged_output = merge_driftctl_snapshots(snapshot_files)
+        # Changes of global resource in snapshot of the same account merged again are skipped.
+        self.assertEqual(merged_output.changelog_index.get_rows(), [["aws_iam_role", "assume_role_policy", 2, 2]])
+
+    def test_changelog_index_paths(self):
+        """
+        Test attribute paths are normalised and interned.
+        :return:
+        """
+        changelog_index = DriftctlChangelogIndex(max_path_depth=2)
+        path = changelog_index.get_path(["ingress", "0", "cidr_blocks", "1"])
+        self.assertEqual(path, ("ingress", "*", "*"))
+        self.assertIs(changelog_index.get_path(["ingress", "3", "from_port"]), path)
+        self.assertEqual(changelog_index.get_path(None), ())
+
+    def test_changelog_index_snapshot(self):
+        """
+        Test changelog index is written to snapshots and merged, and can be printed.
+        :return:
+        """
+        drift_scan_dicts = self.get_test_drift_scan_dicts()
+        expected_output = get_driftctl_combined_output(drift_scan_dicts, keep_change_log=False)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            snapshot_files = []
+            for index, drift_scan_dict in enumerate(drift_scan_dicts):
+                snapshot_files.append(temp_dir + os.sep + f"{index}.snap")
+                dump_driftctl_snapshot(get_driftctl_combined_output([drift_scan_dict], keep_change_log=False),
+                                       snapshot_files[-1])
+            merged_output = merge_driftctl_snapshots(snapshot_files)
+        self.assertEqual(merged_output.changelog_index.get_rows(), expected_output.changelog_index.get_rows())
+        op_file_name_csv = "test_op_changelog.csv"
+        print_driftctl_op(output=merged_output, output_file_mode=DriftctlOutputMode.FILE,
+                          output_file_name=op_file_name_csv, output_file_format=DriftctlOutputFormat.CSV,
+                          print_changelog=True)
+        with open(op_file_name_csv, "r", encoding="utf-8") as data_file_op:
+            data_op = data_file_op.read()
+        os.unlink(op_file_name_csv)
+        self.assertIn("\n\nResource Type,Attribute Path,Changes,Resource(s)\n"
+                      "aws_instance,iam_instance_profile,3,3\n", data_op)
+
+
+class TestDriftctlOpenMetrics(unittest.TestCase):
+    """
+    Test cases for Driftctl Result OpenMetrics output
+    """
+
+    def test_get_drift_metrics(self):
+        """
+        Test resources are counted for each category, account, region and resource type, for managed resources
+        counted with keys only as well as with details.
+        :return:
+        """
+        for managed_details in (False, True):
+            driftctl_op = DriftctlOutput(managed_details=managed_details)
+            for key, test_object in get_driftctl_op_test_objects().items():
+                driftctl_op.add_resource({'cr': DriftctlResourceType.DIFF, 'mr': DriftctlResourceType.MANAGED,
+                                          'umr': DriftctlResourceType.UNMANAGED,
+                                          'mir': DriftctlResourceType.MISSING}[key.rstrip("1")], test_object)
+            self.assertEqual(get_drift_metrics(driftctl_op), {
+                ("changed", "test-changed-account-id", "test-region", "test-changed-type"): 1,
+                ("managed", "test-managed-account-id", "test-managed-region", "test-managed-type"): 1,
+                ("unmanaged", "test-unmanaged-account-id", "test-unmanaged-region", "test-unmanaged-type"): 1,
+                ("missing", "test-missing-account-id", "test-missing-region", "test-missing-type"): 1,
+            })
+
+    def test_write_openmetrics(self):
+        """
+        Test OpenMetrics file is written with coverage and resource counts, and labels are escaped.
+        :return:
+        """
+        driftctl_op = DriftctlOutput()
+        driftctl_op.add_managed_resource(DriftctlResourceMin(id="i-1", type="aws_instance", region="us-east-1",
+                                                             account_id="111111111111", source="a"))
+        driftctl_op.add_unmanaged_resource(DriftctlResourceMin(id="i-2", type="aws_instance", region="us-east-1",
+                                                               account_id="111111111111", source="a"))
+        driftctl_op.add_unmanaged_resource(DriftctlResourceMin(id="p-1", type="aws_iam_policy", region="eu-\"west\"-1",
+                                                               account_id="222222222222", source="b"))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            metrics_file = temp_dir + os.sep + "driftctl.prom"
+            write_openmetrics(driftctl_op, metrics_file)
+            self.assertEqual(os.listdir(temp_dir), ["driftctl.prom"])
+            with open(metrics_file, "r", encoding="utf-8") as metrics:
+                data = metrics.read()
+        self.assertEqual(data, "# HELP driftctl_coverage_percent Percentage of resources managed by Terraform.\n"
+                               "# TYPE driftctl_coverage_percent gauge\n"
+                               "driftctl_coverage_percent 33\n"
+                               "# HELP driftctl_source_coverage_percent Percentage of resources managed by Terraform "
+                               "for each account and region.\n"
+                               "# TYPE driftctl_source_coverage_percent gauge\n"
+                               "driftctl_source_coverage_percent{account_id=\"111111111111\",region=\"us-east-1\"} 50\n"
+                               "driftctl_source_coverage_percent{account_id=\"222222222222\",region=\"eu-\\\"west\\\"-1\"} 0\n"
+                               "# HELP driftctl_resources Number of resources for each category, account, region and "
+                               "resource type.\n"
+                               "# TYPE driftctl_resources gauge\n"
+                               "driftctl_resources{category=\"managed\",account_id=\"111111111111\",region=\"us-east-1\","
+                               "resource_type=\"aws_instance\"} 1\n"
+                               "driftctl_resources{category=\"unmanaged\",account_id=\"111111111111\",region=\"us-east-1\","
+                               "resource_type=\"aws_instance\"} 1\n"
+                               "driftctl_resources{category=\"unmanaged\",account_id=\"222222222222\","
+                               "region=\"eu-\\\"west\\\"-1\",resource_type=\"aws_iam_policy\"} 1\n"
+                               "# EOF\n")
+
+
+class TestDriftctlGlobalResources(unittest.TestCase):
+    """
+    Test cases for Driftctl Result global resources handling
+    """
+
+    def test_global_resources(self):
+        """
+        Test global resources are reported with global region, and combined only from first scan output of an account.
+        :return:
+        """
+        test_driftctl_json_folder = os.path.dirname(os.path.abspath(__file__)) + os.sep + "test_json"
+        drift_scan_dicts = validate_and_load_driftctl_scan_json(
+            [test_driftctl_json_folder + os.sep + folder + os.sep + "test-driftctl-result.json" for folder in "12"],
+            resolve_account_details=False)
+        for drift_scan_dict, region in zip(drift_scan_dicts, ("us-east-1", "us-west-1")):
+            drift_scan_dict["resource_region"] = region
+            drift_scan_dict["resource_account_id"] = "111111111111"
+        test_output = get_driftctl_combined_output(drift_scan_dicts, managed_details=True)
+        self.assertEqual(test_output.get_summary().get_total_resources_count(), 6)
+        for unmanaged in test_output.unmanaged.values():
+            self.assertEqual(unmanaged.region, "global")
+            self.assertEqual(unmanaged.source, drift_scan_dicts[0]["source_file_name"])
+        self.assertEqual(sorted(managed.region for managed in test_output.managed.values()),
+                         ["us-east-1", "us-east-1", "us-west-1", "us-west-1"])
+
+        # Global resources from scan output of another account are not skipped.
+        drift_scan_dicts[1]["resource_account_id"] = "222222222222"
+        records = list(iter_driftctl_resources(drift_scan_dicts, global_resource_index={}))
+        self.assertEqual(len([record for record in records
+                              if record.resource_type == DriftctlResourceType.UNMANAGED]), 4)
+        drift_scan_dicts[1]["resource_account_id"] = "111111111111"
+        records = list(iter_driftctl_resources(drift_scan_dicts, global_resource_index={}))
+        self.assertEqual(len([record for record in records
+                              if record.resource_type == DriftctlResourceType.UNMANAGED]), 2)
+
+    def test_global_resources_region_filter(self):
+        """
+        Test region filters match region reported for resources, global resources only match global region.
+        :return:
+        """
+        drift_scan_dict = {"source_file_name": "./a/us-east-1/r.json", "resource_region": "us-east-1",
+                           "resource_account_id": "111",
+                           "unmanaged": [{"id": "OrgRole", "type": "aws_iam_role"}, {"id": "sg-1", "type": "aws_security_group"}],
+                           "managed": [{"id": "i-1", "type": "aws_instance"}, {"id": "p-1", "type": "aws_iam_policy"}]}
+        records = list(iter_driftctl_resources([drift_scan_dict], filters=DriftctlResourceFilter(regions=["global"])))
+        self.assertEqual([record.resource.id for record in records], ["OrgRole", "p-1"])
+        records = list(iter_driftctl_resources([drift_scan_dict], filters=DriftctlResourceFilter(regions=["us-east-1"])))
+        self.assertEqual([record.resource.id for record in records], ["sg-1", "i-1"])
+        test_output = get_driftctl_combined_output([drift_scan_dict], filters=DriftctlResourceFilter(regions=["global"]))
+        self.assertEqual(test_output.get_summary(), DriftctlSummary(total_managed=1, total_unmanaged=1))
+
+    def test_global_resources_sources(self):
+        """
+        Test sources of global resources are skipped only for scan outputs of the same account.
+        :return:
+        """
+        drift_scan_dicts = [
+            {"source_file_name": f"./{folder}/{region}/r.json", "resource_region": region,
+             "resource_account_id": account_id, "unmanaged": [{"id": "OrgRole", "type": "aws_iam_role"}]}
+            for folder, region, account_id in (("a", "us-east-1", "111"), ("a", "us-west-1", "111"),
+                                               ("b", "eu-west-1", "222"))]
+        test_output = get_driftctl_combined_output(drift_scan_dicts)
+        self.assertEqual([unmanaged.source for unmanaged in test_output.unmanaged.values()],
+                         ["./a/us-east-1/r.json, ./b/eu-west-1/r.json"])
+        # Scan outputs of unknown account may be of different accounts, so sources of all of them are kept.
+        drift_scan_dicts = [
+            {"source_file_name": f"./{folder}/us-east-1/r.json", "resource_region": "us-east-1",
+             "resource_account_id": "", "unmanaged": [{"id": "OrgRole", "type": "aws_iam_role"}]}
+            for folder in ("acct-a", "acct-b")]
+        test_output = get_driftctl_combined_output(drift_scan_dicts)
+        self.assertEqual([unmanaged.source for unmanaged in test_output.unmanaged.values()],
+                         ["./acct-a/us-east-1/r.json, ./acct-b/us-east-1/r.json"])
+
+    def test_merge_snapshots_global_resources(self):
+        """
+        Test merging snapshots of scan outputs of the same account skips global resources, and their changes, already
+        merged for the account, same as combining the scan outputs.
+        :return:
+        """
+        drift_scan_dicts = [
+            {"source_file_name": f"./a/{region}/r.json", "resource_region": region, "resource_account_id": "111",
+             "unmanaged": [{"id": "OrgRole", "type": "aws_iam_role"}],
+             "differences": [{"res": {"id": "logs", "type": "aws_s3_bucket"},
+                              "changelog": [{"type": "update", "path": ["tags", "Owner"]}]}]}
+            for region in ("us-east-1", "us-west-1")]
+        expected_output = get_driftctl_combined_output(drift_scan_dicts)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            snapshot_files = []
+            for index, drift_scan_dict in enumerate(drift_scan_dicts):
+                snapshot_files.append(temp_dir + os.sep + f"{index}.snap")
+                dump_driftctl_snapshot(get_driftctl_combined_output([drift_scan_dict]), snapshot_files[-1])
+            merged_output = merge_driftctl_snapshots(snapshot_files)
+        for test_output in (expected_output, merged_output):
+            self.assertEqual([resource.source for resource in test_output.unmanaged.values()],
+                             ["./a/us-east-1/r.json"])
+            self.assertEqual([resource.source for resource in test_output.differences.values()],
+                             ["./a/us-east-1/r.json"])
+            self.assertEqual(test_output.changelog_index.get_rows(), [["aws_s3_bucket", "tags.Owner", 1, 1]])
+
+
+class TestDriftctlGate(unittest.TestCase):
+    """
+    Test cases for Driftctl Result CI gate mode
+    """
+
+    def setUp(self):
+        self.test_driftctl_json_folder = os.path.dirname(os.path.abspath(__file__)) + os.sep + "test_json"
+        self.drift_scan_dicts = validate_and_load_driftctl_scan_json(
+            find_files(self.test_driftctl_json_folder, "test-driftctl-result.json"), resolve_account_details=False)
+
+    def test_gate_check(self):
+        """
+        Test gate reports breached thresholds only, with exit code of each breach.
+        :return:
+        """
+        test_output = get_driftctl_combined_output(self.drift_scan_dicts)
+        summary = test_output.get_summary()
+        self.assertFalse(DriftctlGate().is_enabled())
+        self.assertEqual(DriftctlGate(fail_under_coverage=summary.coverage,
+                                      max_unmanaged=summary.total_unmanaged).check(test_output), [])
+        breaches = DriftctlGate(fail_under_coverage=summary.coverage + 1, max_missing=summary.total_missing - 1,
+                                max_changed=summary.total_changed).check(test_output)
+        self.assertEqual([exit_code for exit_code, _ in breaches],
+                         [DriftctlExitCode.MISSING_ABOVE_THRESHOLD, DriftctlExitCode.COVERAGE_BELOW_THRESHOLD])
+
+    def test_gate_stops_reading(self):
+        """
+        Test combining stops reading driftctl scan output json dicts once a count threshold is exceeded.
+        :return:
+        """
+        read_dicts = []
+
+        def iter_dicts():
+            for drift_scan_dict in self.drift_scan_dicts:
+                read_dicts.append(drift_scan_dict)
+                yield drift_scan_dict
+
+        gate = DriftctlGate(max_unmanaged=0)
+        test_output = get_driftctl_combined_output(iter_dicts(), stop_condition=gate.is_decided)
+        self.assertTrue(gate.is_decided(test_output))
+        self.assertEqual(test_output.get_summary().total_unmanaged, 1)
+        self.assertLess(len(read_dicts), len(self.drift_scan_dicts))
+        self.assertTrue(test_output.truncated)
+
+        # Threshold exceeded by last resource of the only scan output does not truncate output.
+        drift_scan_dict = {"unmanaged": [{"id": "i-1", "type": "aws_instance"}],
+                           "managed": [{"id": "i-2", "type": "aws_instance"}]}
+        test_output = get_driftctl_combined_output([drift_scan_dict], stop_condition=gate.is_decided)
+        self.assertFalse(test_output.truncated)
+        self.assertEqual(test_output.get_summary(), DriftctlSummary(total_managed=1, total_unmanaged=1))
+
+    def test_main_exit_code(self):
+        """
+        Test commandline returns exit code of breached threshold, and skips report unless partial report is requested.
+        :return:
+        """
+        output_dir = tempfile.mkdtemp()
+        try:
+            output_file = output_dir + os.sep + "report.csv"
+            args = ["-i", self.test_driftctl_json_folder, "-f", "test-driftctl-result.json", "-o", output_file, "-p", "CSV"]
+            self.assertEqual(main(args + ["--fail-under-coverage", "0"]), DriftctlExitCode.OK.value)
+            os.remove(output_file)
+            self.assertEqual(main(args + ["--max-unmanaged", "1"]), DriftctlExitCode.UNMANAGED_ABOVE_THRESHOLD.value)
+            self.assertFalse(os.path.exists(output_file))
+            # Coverage is not checked against partial results, as it is understated by unread resources.
+            errors = io.StringIO()
+            with contextlib.redirect_stderr(errors):
+                self.assertEqual(main(args + ["--max-unmanaged", "1", "--fail-under-coverage", "100"]),
+                                 DriftctlExitCode.UNMANAGED_ABOVE_THRESHOLD.value)
+            self.assertIn("unmanaged", errors.getvalue())
+            self.assertNotIn("coverage", errors.getvalue())
+            # Partial results are printed on request, but not written to snapshot and openmetrics files.
+            snapshot_file = output_dir + os.sep + "report.snap"
+            metrics_file = output_dir + os.sep + "report.prom"
+            self.assertEqual(main(args + ["--max-unmanaged", "1", "--partial-report", "--snapshot", snapshot_file,
+                                          "--openmetrics", metrics_file]),
+                             DriftctlExitCode.UNMANAGED_ABOVE_THRESHOLD.value)
+            self.assertTrue(os.path.exists(output_file))
+            self.assertFalse(os.path.exists(snapshot_file))
+            self.assertFalse(os.path.exists(metrics_file))
+            os.remove(output_file)
+
+            # Report and snapshot are written when threshold is breached after all results are read.
+            with open(self.test_driftctl_json_folder + os.sep + "1" + os.sep + "test-driftctl-result.json", "r",
+                      encoding="utf-8") as in_file:
+                drift_scan_dict = json.load(in_file)
+            drift_scan_dict["unmanaged"] = drift_scan_dict["unmanaged"][:1]
+            drift_scan_dict["differences"] = []
+            os.mkdir(output_dir + os.sep + "scan")
+            with open(output_dir + os.sep + "scan" + os.sep + "test-driftctl-result.json", "w",
+                      encoding="utf-8") as out_file:
+                json.dump(drift_scan_dict, out_file)
+            args[1] = output_dir + os.sep + "scan"
+            self.assertEqual(main(args + ["--max-unmanaged", "0", "--snapshot", snapshot_file]),
+                             DriftctlExitCode.UNMANAGED_ABOVE_THRESHOLD.value)
+            self.assertTrue(os.path.exists(output_file))
+            self.assertTrue(os.path.exists(snapshot_file))
+        finally:
+            shutil.rmtree(output_dir)
+
+
+class TestDriftctlHtmlReport(unittest.TestCase):
+    """
+    Test cases for Driftctl Result html report
+    """
+
+    def test_html_report(self):
+        """
+        Test html report embeds detail rows as string table references, and resource ids can not end script element.
+        :return:
+        """
+        driftctl_op = DriftctlOutput()
+        driftctl_op.add_unmanaged_resource(DriftctlResourceMin(id="</script><!--", type="aws_iam_policy",
+                                                               account_id="111111111111", source="a"))
+        for index in range(HTML_REPORT_WRITE_BATCH_ROWS + 1):
+            driftctl_op.add_missing_resource(DriftctlResourceMin(id=f"i-{index}", type="aws_instance",
+                                                                 region="us-east-1", account_id="111111111111",
+                                                                 source="a"))
+        output_dir = tempfile.mkdtemp()
+        try:
+            print_driftctl_op(driftctl_op, print_details=True, output_file_mode=DriftctlOutputMode.FILE,
+                              output_file_name=output_dir + os.sep + "report",
+                              output_file_format=DriftctlOutputFormat.HTML, sort_by=["id"])
+            with open(output_dir + os.sep + "report.html", "r", encoding="utf-8") as report_file:
+                report = report_file.read()
+        finally:
+            shutil.rmtree(output_dir)
+        self.assertEqual(report.count("</script>"), 2)
+        payload_start = report.index('id="driftctl-details">') + len('id="driftctl-details">')
+        payload = json.loads(report[payload_start:report.index("</script>", payload_start)])
+        columns = len(payload["columns"])
+        rows = [[payload["strings"][ref] for ref in payload["rows"][offset:offset + columns]]
+                for offset in range(0, len(payload["rows"]), columns)]
+        self.assertEqual(len(rows), HTML_REPORT_WRITE_BATCH_ROWS + 2)
+        self.assertEqual(rows[0], ["Unmanaged", "</script><!--", "aws_iam_policy", "", "111111111111", "a"])
+        self.assertEqual(rows[1], ["Missing", "i-0", "aws_instance", "us-east-1", "111111111111", "a"])
+        # Unique resource ids, and 8 values repeated across rows are held once in string table.
+        self.assertEqual(len(payload["strings"]), len(rows) + 8)
+
+    @unittest.skipUnless(shutil.which("node"), "node is required to run html report script")
+    def test_html_report_scroll(self):
+        """
+        Test detail view of a million rows keeps scroll height below browser limits, and scrolling to the end renders
+        the last rows at the bottom of the viewport.
+        :return:
+        """
+        count = 1000000
+        report = io.StringIO()
+        print_html_detail_view(report, (["Unmanaged", f"sg-{index:07d}", "aws_security_group", "us-east-1",
+                                         "111111111111", "a"] for index in range(count)), DETAIL_HEADERS)
+        report = report.getvalue()
+        payload_start = report.index('id="driftctl-details">') + len('id="driftctl-details">')
+        script_start = report.index("<script>") + len("<script>")
+        # Minimal document with a viewport of 20 rows, the scroll listener is called after scrolling to the end.
+        harness = """
+var fs = require("fs"), elements = {}, listeners = {};
+function element(id) {
+  return elements[id] || (elements[id] = {id: id, style: {}, childNodes: [], textContent: "", value: "", scrollTop: 0,
+    clientHeight: 480, addEventListener: function (name, listener) { listeners[id + name] = listener; },
+    appendChild: function (child) { this.childNodes.push(child); }});
+}
+global.document = {getElementById: element, createElement: function () { return element(Math.random()); }};
+global.window = {addEventListener: function () {}, requestAnimationFrame: function (callback) { callback(); }};
+element("driftctl-details").textContent = fs.readFileSync(process.argv[2], "utf8");
+eval(fs.readFileSync(process.argv[3], "utf8"));
+var viewport = element("driftctl-viewport"), spacer = element("driftctl-spacer"), rows = element("driftctl-rows");
+viewport.scrollTop = parseInt(spacer.style.height, 10) - viewport.clientHeight;
+listeners["driftctl-viewportscroll"]();
+var ids = rows.innerHTML.match(/sg-[0-9]+/g);
+console.log(JSON.stringify({spacer: parseInt(spacer.style.height, 10), scrollTop: viewport.scrollTop,
+  translate: parseFloat(rows.style.transform.slice(11)), first: ids[0], last: ids[ids.length - 1],
+  rendered: ids.length / 2}));
+"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            files = []
+            for name, content in (("payload.json", report[payload_start:report.index("</script>", payload_start)]),
+                                  ("script.js", report[script_start:report.index("</script>", script_start)]),
+                                  ("harness.js", harness)):
+                files.append(temp_dir + os.sep + name)
+                with open(files[-1], "w", encoding="utf-8") as out_file:
+                    out_file.write(content)
+            command = [str(shutil.which("node")), files[2], files[0], files[1]]
+            # Disabling bandit B603 check on below line as node only runs scripts written above.
+            process = subprocess.run(command, check=True, capture_output=True, text=True, timeout=300)  # nosec B603
+        result = json.loads(process.stdout)
+        self.assertLess(result["spacer"], 17000000)
+        self.assertEqual(result["last"], f"sg-{count - 1:07d}")
+        self.assertEqual(result["first"], f"sg-{count - result['rendered']:07d}")
+        # Last row ends at the bottom of the viewport, which is the end of the spacer.
+        self.assertAlmostEqual(result["translate"] + result["rendered"] * 24, result["spacer"], delta=0.01)
+
+
+class TestDriftctlApproximate(unittest.TestCase):
+    """
+    Test cases for Driftctl Result approximate summary
+    """
+
+    def setUp(self):
+        self.test_driftctl_json_folder = os.path.dirname(os.path.abspath(__file__)) + os.sep + "test_json"
+        self.drift_scan_dicts = validate_and_load_driftctl_scan_json(
+            find_files(self.test_driftctl_json_folder, "test-driftctl-result.json"), resolve_account_details=False)
+
+    def test_sketch_estimate(self):
+        """
+        Test sketch estimates number of distinct keys within error bound, irrespective of duplicate keys.
+        :return:
+        """
+        sketch = DriftctlSketch()
+        self.assertEqual(sketch.get_count(), 0)
+        for _ in range(2):
+            for index in range(20000):
+                sketch.add_key(get_resource_key(f"i-{index}", "aws_instance"))
+        self.assertAlmostEqual(sketch.estimate() / 20000, 1, delta=0.03)
+        self.assertFalse(sketch.is_sparse())
+        self.assertEqual(len(sketch.registers), 2 ** 14)
+        with self.assertRaises(ValueError):
+            DriftctlSketch(precision=20)
+        with self.assertRaises(ValueError):
+            sketch.merge(DriftctlSketch(precision=10))
+
+    def test_sketch_estimate_bias(self):
+        """
+        Test mean error of sketch estimate stays within 1% for 2.5 to 3 times as many keys as registers, where
+        estimate switched from linear counting to HyperLogLog estimate.
+        :return:
+        """
+        # Disabling bandit B311 check on below line as keys only need to be uniformly distributed, not secure.
+        generator = random.Random(0)  # nosec B311
+        for precision, count, trials in ((10, 2600, 200), (12, 11000, 40)):
+            error = 0.0
+            for _ in range(trials):
+                sketch = DriftctlSketch(precision)
+                for _ in range(count):
+                    sketch.add_key(generator.getrandbits(64))
+                error += sketch.estimate() / count - 1
+            self.assertLess(abs(error / trials), 0.01)
+
+    def test_sparse_sketch(self):
+        """
+        Test sketch stays sparse for few keys, and sparse sketches merge to the same sketch as registers.
+        :return:
+        """
+        sparse_sketch = DriftctlSketch(precision=10)
+        dense_sketch = DriftctlSketch(precision=10, registers=bytes(2 ** 10))
+        for index in range(100):
+            key = get_resource_key(f"i-{index}", "aws_instance")
+            sparse_sketch.add_key(key)
+            dense_sketch.add_key(key)
+        self.assertTrue(sparse_sketch.is_sparse())
+        self.assertEqual(sparse_sketch, dense_sketch)
+        self.assertEqual(sparse_sketch.estimate(), dense_sketch.estimate())
+        self.assertAlmostEqual(sparse_sketch.get_count(), 100, delta=5)
+        other_sketch = DriftctlSketch(precision=10)
+        for index in range(100, 300):
+            key = get_resource_key(f"i-{index}", "aws_instance")
+            other_sketch.add_key(key)
+            dense_sketch.add_key(key)
+        sparse_sketch.merge(other_sketch)
+        self.assertFalse(sparse_sketch.is_sparse())
+        self.assertEqual(sparse_sketch, dense_sketch)
+
+    def test_approximate_summary(self):
+        """
+        Test approximate summary matches exact summary for small number of resources.
+        :return:
+        """
+        approximate_summary = get_driftctl_approximate_output(self.drift_scan_dicts).get_summary()
+        summary = get_driftctl_combined_output(self.drift_scan_dicts).get_summary()
+        for count in ("total_managed", "total_missing", "total_unmanaged", "total_changed"):
+            self.assertAlmostEqual(getattr(approximate_summary, count), getattr(summary, count), delta=1)
+        approximate_output = get_driftctl_approximate_output(
+            self.drift_scan_dicts, filters=DriftctlResourceFilter(types=["aws_instance"]))
+        self.assertEqual(approximate_output.get_summary(), DriftctlSummary(total_managed=3, total_changed=3))
+
+    def test_merge_sketches(self):
+        """
+        Test sketch files written for parts of driftctl scan outputs merge to the same sketches as all outputs.
+        :return:
+        """
+        output_dir = tempfile.mkdtemp()
+        try:
+            sketch_files = []
+            for index, drift_scan_dict in enumerate(self.drift_scan_dicts):
+                drift_scan_dict["resource_account_id"] = str(index % 2)
+                sketch_files.append(output_dir + os.sep + f"{index}.sketch")
+                dump_driftctl_sketches(get_driftctl_approximate_output([drift_scan_dict]), sketch_files[-1])
+            with open(output_dir + os.sep + "invalid.sketch", "wb") as invalid_file:
+                invalid_file.write(b"invalid")
+            merged_output = merge_driftctl_sketches(sketch_files + [output_dir + os.sep + "invalid.sketch"])
+        finally:
+            shutil.rmtree(output_dir)
+        approximate_output = get_driftctl_approximate_output(self.drift_scan_dicts)
+        self.assertEqual(merged_output.sketches, approximate_output.sketches)
+        self.assertTrue(all(sketch.is_sparse() for sketches in merged_output.source_sketches.values()
+                            for sketch in sketches.values()))
+        self.assertEqual(merged_output.get_source_summaries(), approximate_output.get_source_summaries())
+        self.assertEqual(sorted(merged_output.get_source_summaries()),
+                         [("0", ""), ("0", "global"), ("1", ""), ("1", "global")])
+
+    def test_main_approximate(self):
+        """
+        Test commandline prints approximate summary, and checks CI gate thresholds against it.
+        :return:
+        """
+        output_dir = tempfile.mkdtemp()
+        try:
+            output_file = output_dir + os.sep + "report.csv"
+            args = ["-i", self.test_driftctl_json_folder, "-f", "test-driftctl-result.json", "-o", output_file, "-p",
+                    "CSV", "--approximate", "--detailed"]
+            self.assertEqual(main(args + ["--max-unmanaged", "1"]), DriftctlExitCode.UNMANAGED_ABOVE_THRESHOLD.value)
+            with open(output_file, "r", encoding="utf-8") as report_file:
+                report = report_file.read()
+        finally:
+            shutil.rmtree(output_dir)
+        self.assertTrue(report.startswith("Approximate summary,count"))
+        self.assertIn("Account Id,Region,Coverage,Found,Managed,Missing,Unmanaged,Changed", report)
+
+
+@unittest.skipUnless(importlib.util.find_spec("moto"), "moto is required for S3 tests")
+class TestDriftctlS3(unittest.TestCase):
+    """
+    Test cases for Driftctl Result reading driftctl scan output json files from S3, against moto S3 stand-in.
+    """
+
+    def setUp(self):
+        # pylint: disable=import-outside-toplevel
+        import boto3  # type: ignore
+        from moto import mock_aws
+        self.environ = {key: os.environ.get(key) for key in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY",
+                                                             "AWS_DEFAULT_REGION", "AWS_ENDPOINT_URL")}
+        # Disabling bandit B106 check on below line as credentials are dummy values used by moto S3 stand-in.
+        os.environ.update(AWS_ACCESS_KEY_ID="testing", AWS_SECRET_ACCESS_KEY="testing",  # nosec B106
+                          AWS_DEFAULT_REGION="us-east-1")
+        os.environ.pop("AWS_ENDPOINT_URL", None)
+        self.mock = mock_aws()
+        self.mock.start()
+        self.client = boto3.client("s3")
+        self.client.create_bucket(Bucket="driftctl-results")
+        test_driftctl_json_folder = os.path.dirname(os.path.abspath(__file__)) + os.sep + "test_json"
+        for folder in ("1", "2", "4"):
+            with open(test_driftctl_json_folder + os.sep + folder + os.sep + "test-driftctl-result.json", "rb") as body:
+                self.client.put_object(Bucket="driftctl-results", Key=f"scans/account-{folder}/test-driftctl-result.json",
+                                       Body=body.read(), Metadata={"resource-region": "us-east-1",
+                                                                   "resource-account-id": f"11111111111{folder}"})
+        self.client.put_object(Bucket="driftctl-results", Key="scans/account-1/other-result.json", Body=b"{}")
+        self.client.put_object(Bucket="driftctl-results", Key="other/test-driftctl-result.json", Body=b"{}")
+
+    def tearDown(self):
+        self.mock.stop()
+        for key, value in self.environ.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    def test_parse_s3_url(self):
+        """
+        Test S3 url is parsed to bucket and prefix.
+        :return:
+        """
+        self.assertEqual(parse_s3_url("s3://bucket/a/b"), ("bucket", "a/b"))
+        self.assertEqual(parse_s3_url("s3://bucket"), ("bucket", ""))
+        with self.assertRaises(ValueError):
+            parse_s3_url("s3:///prefix")
+
+    def test_iter_s3_driftctl_scan_json(self):
+        """
+        Test driftctl scan output json files are found under prefix and read from S3, with details from metadata,
+        and objects which can not be parsed are ignored.
+        :return:
+        """
+        drift_scan_dicts = list(iter_s3_driftctl_scan_json("s3://driftctl-results/scans/", "test-driftctl-result.json",
+                                                           max_workers=1, client=self.client))
+        self.assertEqual([drift_scan_dict["source_file_name"] for drift_scan_dict in drift_scan_dicts],
+                         ["s3://driftctl-results/scans/account-1/test-driftctl-result.json",
+                          "s3://driftctl-results/scans/account-2/test-driftctl-result.json"])
+        self.assertEqual([drift_scan_dict["resource_account_id"] for drift_scan_dict in drift_scan_dicts],
+                         ["111111111111", "111111111112"])
+        self.assertEqual(drift_scan_dicts[0]["resource_region"], "us-east-1")
+
+    def test_s3_account_details(self):
+        """
+        Test region and account id details are read from terraform output object next to driftctl scan output json
+        object, else from object key, else from object metadata.
+        :return:
+        """
+        body = b'{"managed": []}'
+        self.client.put_object(Bucket="driftctl-results", Key="sync/222222222222/eu-west-1/test-driftctl-result.json",
+                               Body=body, Metadata={"resource-region": "us-east-1"})
+        self.client.put_object(Bucket="driftctl-results", Key="sync/tf/test-driftctl-result.json", Body=body)
+        self.client.put_object(Bucket="driftctl-results", Key="sync/tf/terraform-output.json",
+                               Body=b'{"resource_region": {"value": "us-west-2"}, '
+                                    b'"resource_account_id": {"value": "333333333333"}}')
+        self.client.put_object(Bucket="driftctl-results", Key="sync/unknown/test-driftctl-result.json", Body=body)
+        # Only AWS region names match, and the first matching element of the key is used.
+        self.client.put_object(Bucket="driftctl-results",
+                               Key="sync/111111111111/us-east-1/qa-env-1/222222222222/test-driftctl-result.json", Body=body)
+        self.client.put_object(Bucket="driftctl-results", Key="sync/my-app-2/test-driftctl-result.json", Body=body,
+                               Metadata={"resource-region": "us-east-2", "resource-account-id": "444444444444"})
+        drift_scan_dicts = list(iter_s3_driftctl_scan_json("s3://driftctl-results/sync", "test-driftctl-result.json",
+                                                           client=self.client))
+        self.assertEqual([(drift_scan_dict["resource_region"], drift_scan_dict["resource_account_id"])
+                          for drift_scan_dict in drift_scan_dicts],
+                         [("us-east-1", "111111111111"), ("eu-west-1", "222222222222"), ("us-east-2", "444444444444"),
+                          ("us-west-2", "333333333333"), ("", "")])
+
+    def test_aggregate_s3(self):
+        """
+        Test aggregate combines driftctl scan output json files from S3 same as from local directory.
+        :return:
+        """
+        s3_output = aggregate("s3://driftctl-results/scans", file_name="test-driftctl-result.json",
+                              filters=DriftctlResourceFilter(types=["aws_instance"]))
+        self.assertEqual(s3_output.get_summary(), DriftctlSummary(total_managed=2, total_changed=2))